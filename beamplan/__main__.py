@@ -20,94 +20,381 @@ __author__ = "Robert Dekovich"
 __email__ = "dekovich@umich.edu"
 __status__ = "Development"
 
+import sys
+import json
 import click
+import cProfile
+import numpy as np
+from os import cpu_count
 from os.path import abspath
+from time import perf_counter
 
 from beamplan.modules.validate import validateInfile
-from beamplan.modules.parse import parseInfile
-from beamplan.modules.measurement import satteliteIsVisible, isExternalInterference
+from beamplan.modules.parse import parseColumns, parseEpochs
+from beamplan.modules.cache import loadColumns
+from beamplan.modules.solver import solvers
+from beamplan.modules.epochs import planEpochs
+from beamplan.modules.propagate import parseConstellation, propagatedEpochs
+from beamplan.modules.batch import expandInfiles, runBatch, summarize
+from beamplan.modules.evaluation import evaluatePlan
+from beamplan.modules.generate import distributions, generateScenario, writeScenario
+from beamplan.modules.profiling import phase, peakRSS, startProfiling, stopProfiling
+from beamplan.modules.rejection import reasonNames, rejectionReasons, rejectionHistogram
+from beamplan.modules.write import formats, openOutput, writePlan, streamPlan
+from beamplan.classes.Plan import Plan
+from beamplan.classes.DefaultGroup import DefaultGroup
 
-@click.command(help="A command-line tool to determine Starlink beam planning.")
+@click.group(cls=DefaultGroup, default="plan", help="A command-line tool to determine Starlink beam planning.")
+def main():
+    """
+    Main module invoked upon package call.
+
+    Dispatches to the command named in the arguments, or plans a single
+    scenario (the plan command) when no command is named.
+    """
+
+@main.command("plan", help="Plans the beams of a scenario (the default command).")
 @click.argument("infile")
 @click.option("--debug", "-d", required=False, is_flag=True, help="Writes standard out to an *.out file")
-def main(infile, debug):
+@click.option("--solver", "-s", required=False, default="greedy", type=click.Choice(list(solvers)), help="Solver used to assign the beams")
+@click.option("--workers", "-w", required=False, default=1, type=click.IntRange(1), help="Number of processes to build the beams across")
+@click.option("--cache/--no-cache", required=False, default=True, help="Reuses (and saves) the parsed scenario in the cache")
+@click.option("--format", "-f", "outputFormat", required=False, default="text", type=click.Choice(formats), help="Format the beams are written in")
+@click.option("--output", "-o", required=False, default=None, help="Writes the beams to this path instead of standard out")
+@click.option("--stream", required=False, is_flag=True, help="Writes the beams of each sattelite as soon as they are final, rather than after the whole plan")
+@click.option("--verify", required=False, is_flag=True, help="Checks the plan against the evaluator's constraints, reporting as JSON to standard error")
+@click.option("--report", required=False, default=None, help="Writes the verification report, as JSON, to this path instead (implies --verify)")
+@click.option("--profile", required=False, is_flag=True, help="Records the time of each phase and counters of the work done, reporting as JSON to standard error")
+@click.option("--profile-report", "profileReport", required=False, default=None, help="Writes the profile, as JSON, to this path instead (implies --profile)")
+@click.option("--cprofile", required=False, default=None, help="Dumps the statistics of cProfile over the run to this path (implies --profile)")
+@click.option("--rejections", required=False, is_flag=True, help="Reports how many users went unserved for each reason, as JSON to standard error")
+@click.option("--rejections-file", "rejectionsFile", required=False, default=None, help="Saves the reason of every user to this .npz path (implies --rejections)")
+def planCommand(infile, debug, solver, workers, cache, outputFormat, output, stream, verify, report, profile, profileReport, cprofile, rejections, rejectionsFile):
     """
-    Main module invoked upon package call.
+    Plans the beams of a single scenario.
 
     Takes required infile input to parse, processes input
     based on constraints of the problem, and outputs the results
     to standard out.  If debug is specified, it will also
-    save the output to an equivalent *.out file.
+    save the output to an equivalent *.out file.  The beams are
+    written in bulk, as text (the default), CSV, JSON lines or a
+    binary .npz file (see modules.write), or streamed in a text format
+    as each sattelite's beams become final.  If verify is
+    specified, the plan in memory is checked against the constraints
+    of bin/evaluate.py (see modules.evaluation), a JSON report is
+    written, and the command exits with an error status on failure.
+    If profile is specified, the wall and CPU time of each phase and
+    counters of the work done are reported as JSON (see modules.profiling).
+    If rejections is specified, the reason each unserved user lost out
+    is counted into a JSON histogram (see modules.rejection).
 
     Arguments:
         infile {str} -- relative or full path of the input file to process
         debug {bool} -- flag that if true, will output to an *.out file as well
+        solver {str} -- name of the solver used to assign the beams (see modules.solver)
+        workers {int} -- number of processes to build the beams across (1 is serial)
+        cache {bool} -- flag that if true, will load the parsed scenario from the cache (see modules.cache)
+        outputFormat {str} -- format the beams are written in (see write.formats)
+        output {str} -- path to write the beams to (None for standard out, or the *.out file in debug mode)
+        stream {bool} -- flag that if true, will write each sattelite's beams as soon as they are final
+        verify {bool} -- flag that if true, will verify the plan and report to standard error
+        report {str} -- path to write the verification report to, as JSON (None for standard error)
+        profile {bool} -- flag that if true, will profile the run and report to standard error
+        profileReport {str} -- path to write the profile to, as JSON (None for standard error)
+        cprofile {str} -- path to dump the statistics of cProfile to (None for none)
+        rejections {bool} -- flag that if true, will report the histogram of the reasons users are unserved
+        rejectionsFile {str} -- path to save the user IDs and the code of each one's reason to (None for none)
     
     Returns:
         Prints to standard out the output of the beamplan package call.
     """
     
+    # A binary file is written whole, and cannot be streamed
+    if stream and outputFormat == "npz":
+        raise click.UsageError("The npz format cannot be streamed.")
+
     try:
         # Validate the infile from the user, raise descript error if invalid
         validateInfile(infile)
     except OSError as e:
         print("OSError: {}".format(e))
         exit()
+
+    # If the user asked to profile the run, record the phases (and cProfile, if asked) from here on
+    profiling = profile or profileReport is not None or cprofile is not None
+    if profiling:
+        startProfiling()
+    if cprofile is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
     
-    # Parse the input file into it's respective mappings and classes
-    users, sattelites, interferences = parseInfile(abspath(infile))
-
-    # For each of the users (Runtime: numUsers * max(numSattelites, numInterferences))
-    for userID, user in users.items():
-        # For each of the sattelites
-        for _, sattelite in sattelites.items():
-            # If this sattelite is visible to this user (constraint)
-            if satteliteIsVisible(user, sattelite):
-                # Add this user to the list of viable users for this sattelite
-                sattelite.addViableUser(userID)
-    
-    # For each sattelite (Runtime: numSattelites * numViableUsers[N] * numPossInterference[N])
-    for _, sattelite in sattelites.items():
-        # Acquire a copy of the viable users of the sattelite
-        viableUsers = sattelite.getViableUsers().copy()
-
-        # For each of the viable users for this sattelite
-        for viableUserID in viableUsers:
-            # For each possible interference that the user can have
-            for _, interference in interferences.items():
-                # If there is an external interference between these..
-                if isExternalInterference(users[viableUserID], interference, sattelite):
-                    # Remove this user from the list of viable users for this sattelite
-                    sattelite.removeViableUser(viableUserID)
-                    break
-    
-    # Create an empty dictionary, mapping users to sattelites (beams)
-    existing = {}
-
-    def getUser(userID):
-        """
-        Returns the User object of a given userID
-        """
-        return users[userID]
-        
-    # For each sattelite
-    for _, sattelite in sattelites.items():
-        # Connect to as many beams as possible given the constraints
-        sattelite.beamFactory(existing, getUser)
-    
-    # If the user specific debug mode
-    outfile = None
-    if debug:
-        # Open an output file (and create it) in the same place as the infile
-        outfile = open(abspath(infile) + '.out', 'w')
-    
-    # For each sattelite
-    for _, sattelite in sattelites.items():
-        # For each of the beams in the sattelites
-        for beam in sattelite.getBeams():
-            # If the user specified debug mode
-            if debug:
-                outfile.write("{}\n".format(beam))
-            else:
-                print(beam)
-    
\ No newline at end of file
+    try:
+        # Parse the input file into columns of IDs and positions per kind of entity (or load them)
+        with phase("parse"):
+            columns = loadColumns(abspath(infile)) if cache else parseColumns(abspath(infile))
+    except ValueError as e:
+        print(e)
+        exit()
+
+    # Build the plan of the scenario from the columns (the tables, and the sattelite classes)
+    plan = Plan.fromColumns(columns)
+
+    # Determine the viable users of each sattelite (visibility, then external interference)
+    plan.computeViability()
+
+    # If the user specific debug mode, the output file is in the same place as the infile
+    if output is None and debug:
+        output = abspath(infile) + '.out'
+
+    if stream:
+        # Connect the beams with the chosen solver, writing each sattelite's beams as soon as they are final
+        with phase("assign"), openOutput(output, outputFormat) as outfile:
+            streamPlan(plan.settleBeams(solver, workers), outfile, outputFormat)
+    else:
+        # Connect as many beams as possible given the constraints, with the chosen solver
+        plan.assignBeams(solver, workers)
+
+        # Write the beams of every sattelite in bulk, to the output file (created, and closed) or standard out
+        with phase("output"), openOutput(output, outputFormat) as outfile:
+            writePlan(plan, outfile, outputFormat)
+
+    # If the user asked to verify the plan, check it in memory (no second pass over the text)
+    verification = None
+    if verify or report is not None:
+        start = perf_counter()
+        with phase("verify"):
+            verification = dict(evaluatePlan(plan)._asdict(), infile=abspath(infile), beams=len(plan.existing))
+        verification["seconds"] = perf_counter() - start
+
+        if report is not None:
+            with open(report, 'w') as f:
+                json.dump(verification, f, indent=2)
+        else:
+            click.echo(json.dumps(verification), err=True)
+
+    # If the user asked why users are unserved, report the reasons recorded while planning
+    if rejections or rejectionsFile is not None:
+        reasons = rejectionReasons(plan)
+        click.echo(json.dumps({"rejections": rejectionHistogram(reasons)}), err=True)
+
+        if rejectionsFile is not None:
+            np.savez(rejectionsFile, ids=plan.users.ids, reasons=reasons, names=np.array(reasonNames))
+
+    # If the user asked to profile the run, report the profile of every phase
+    if cprofile is not None:
+        profiler.disable()
+        profiler.dump_stats(cprofile)
+    if profiling:
+        measurements = stopProfiling().report(peakRSS())
+
+        if profileReport is not None:
+            with open(profileReport, 'w') as f:
+                json.dump(measurements, f, indent=2)
+        else:
+            click.echo(json.dumps(measurements), err=True)
+
+    if verification is not None and not verification["passed"]:
+        exit(1)
+
+
+@main.command("epochs", help="Plans a sequence of scenarios (epochs) in one process, warm-starting each from the last.")
+@click.argument("infiles", nargs=-1, required=True)
+@click.option("--debug", "-d", required=False, is_flag=True, help="Writes standard out to an *.out file (of the first infile)")
+@click.option("--solver", "-s", required=False, default="greedy", type=click.Choice(list(solvers)), help="Solver used to assign the beams of every epoch")
+@click.option("--workers", "-w", required=False, default=1, type=click.IntRange(1), help="Number of processes to build the beams across")
+@click.option("--warm/--cold", required=False, default=True, help="Warm-starts each epoch from the plan of the epoch before")
+@click.option("--constellation", "-c", required=False, default=None, help="Propagates the sattelites from a constellation file, in place of the infile's")
+@click.option("--count", "-n", required=False, default=1, type=click.IntRange(1), help="Number of epochs to propagate the constellation for")
+@click.option("--step", required=False, default=60.0, type=float, help="Seconds between the propagated epochs")
+@click.option("--start", required=False, default=0.0, type=float, help="Seconds from time zero of the first propagated epoch")
+def epochsCommand(infiles, debug, solver, workers, warm, constellation, count, step, start):
+    """
+    Plans the beams of a sequence of scenarios, in order, in one process.
+
+    Each infile is one epoch, or several when it is split by epoch markers
+    (lines such as "epoch 12", see parse.parseEpochs).  With a constellation,
+    the epochs are instead the users and interferers of a single infile under
+    the sattelites propagated to each time (see modules.propagate).  The beams of each epoch
+    are output after its marker, and a report of the epoch (its timing, and the
+    users handed over between sattelites) is printed to standard error.
+
+    Arguments:
+        infiles {tuple} -- relative or full paths of the input files to process, in order
+        debug {bool} -- flag that if true, will output to an *.out file (of the first infile) as well
+        solver {str} -- name of the solver used to assign the beams of every epoch (see modules.solver)
+        workers {int} -- number of processes to build the beams across (1 is serial)
+        warm {bool} -- flag that if true, will warm-start each epoch from the last (see modules.epochs)
+        constellation {str} -- relative or full path of a constellation file to propagate (None for none)
+        count {int} -- number of epochs to propagate the constellation for
+        step {float} -- seconds between the propagated epochs
+        start {float} -- seconds from time zero of the first propagated epoch
+
+    Returns:
+        Prints to standard out the beams of every epoch.
+    """
+
+    # A constellation is propagated against the users and interferers of one scenario
+    if constellation is not None and len(infiles) != 1:
+        raise click.UsageError("A constellation takes exactly one infile, of the users and interferers.")
+
+    try:
+        # Validate every infile up front, raise descript error if invalid
+        for infile in infiles + ((constellation,) if constellation is not None else ()):
+            validateInfile(infile)
+    except OSError as e:
+        print("OSError: {}".format(e))
+        exit()
+
+    if constellation is not None:
+        try:
+            # Parse the scenario and the shells, and propagate the sattelites to every epoch at once
+            shells = parseConstellation(abspath(constellation))
+            columns = parseColumns(abspath(infiles[0]))
+        except ValueError as e:
+            print(e)
+            exit()
+
+        epochs = propagatedEpochs(columns, shells, start + (step * np.arange(count)))
+    else:
+        # Read the epochs lazily, one file after another
+        epochs = (epoch for infile in infiles for epoch in parseEpochs(abspath(infile)))
+
+    # If the user specific debug mode, open an output file (and create it) next to the first infile
+    outfile = open(abspath(infiles[0]) + '.out', 'w') if debug else None
+
+    try:
+        for plan, report in planEpochs(epochs, solver, workers, warm):
+            # Output the marker of the epoch, then its beams (in bulk)
+            out = outfile if debug else sys.stdout
+            out.write("epoch {}\n".format(report.label))
+            writePlan(plan, out)
+            out.flush()
+
+            click.echo("epoch {}: {} in {:.3f}s (read in {:.3f}s), {} beams, {} handovers, {} gained, {} lost".format(
+                report.label, report.mode, report.planSeconds, report.readSeconds,
+                report.beams, report.handovers, report.gained, report.lost), err=True)
+    except ValueError as e:
+        print(e)
+        exit()
+    finally:
+        if outfile is not None:
+            outfile.close()
+
+@main.command("batch", help="Plans and evaluates many scenarios in one command, across a pool of processes.")
+@click.argument("infiles", nargs=-1, required=True)
+@click.option("--processes", "-p", required=False, default=None, type=click.IntRange(1), help="Number of processes to spread the scenarios across (default is one per CPU)")
+@click.option("--solver", "-s", required=False, default="greedy", type=click.Choice(list(solvers)), help="Solver used to assign the beams")
+@click.option("--cache/--no-cache", required=False, default=True, help="Reuses (and saves) the parsed scenarios in the cache")
+@click.option("--write", "-o", required=False, is_flag=True, help="Writes the beams of each scenario to its *.out file")
+@click.option("--summary", required=False, default=None, help="Writes the summary of the batch, as JSON, to this path")
+def batchCommand(infiles, processes, solver, cache, write, summary):
+    """
+    Plans and evaluates many scenarios in one command.
+
+    The infiles may be paths or glob patterns (e.g. "var/tests/*.txt").  The result
+    of each scenario is printed as soon as it finishes, followed by the totals of the
+    batch.  The command exits with an error status unless every scenario passed.
+
+    Arguments:
+        infiles {tuple} -- relative or full paths (or glob patterns) of the input files
+        processes {int} -- number of processes to spread the scenarios across (None for one per CPU)
+        solver {str} -- name of the solver used to assign the beams (see modules.solver)
+        cache {bool} -- flag that if true, will load the parsed scenarios from the cache (see modules.cache)
+        write {bool} -- flag that if true, will write the beams of each scenario to its *.out file
+        summary {str} -- path to write the summary of the batch to, as JSON (None for none)
+    """
+    try:
+        # Expand the patterns, and validate every infile up front
+        infiles = expandInfiles(infiles)
+        for infile in infiles:
+            validateInfile(infile)
+    except OSError as e:
+        print("OSError: {}".format(e))
+        exit()
+
+    start = perf_counter()
+    results = []
+
+    # Print the result of each scenario as it finishes
+    for result in runBatch(infiles, min(processes or cpu_count() or 1, len(infiles)), solver, cache, write):
+        results.append(result)
+
+        if "error" in result:
+            line = "error: {}".format(result["error"])
+        else:
+            coverage = "no users" if result["coverage"] is None else "{}% of {} total users covered".format(result["coverage"], result["users"])
+            verdict = "passed" if result["passed"] else "failed {} ({})".format(result["failed"], result["message"].replace("\n", " "))
+            line = "{}, {}, {} beams in {:.3f}s".format(verdict, coverage, result["beams"], result["planSeconds"])
+
+        print("{}: {}".format(result["infile"], line), flush=True)
+
+    totals = summarize(results, perf_counter() - start)
+    meanCoverage = "n/a" if totals["meanCoverage"] is None else "{:.2f}%".format(totals["meanCoverage"])
+    print("{} of {} scenarios passed, {} failed, {} errors, mean coverage {}, in {:.3f}s".format(
+        totals["passed"], totals["scenarios"], totals["failed"], totals["errors"], meanCoverage, totals["seconds"]))
+
+    if summary is not None:
+        with open(summary, 'w') as f:
+            json.dump(totals, f, indent=2)
+
+    if totals["passed"] != totals["scenarios"]:
+        exit(1)
+
+@main.command("generate", help="Writes a synthetic scenario, drawn from a seeded generator.")
+@click.argument("outfile")
+@click.option("--users", "-n", required=False, default=10000, type=click.IntRange(0), help="Number of users")
+@click.option("--distribution", required=False, default="uniform", type=click.Choice(distributions), help="Distribution of the users over the Earth")
+@click.option("--interferers", "-i", required=False, default=36, type=click.IntRange(0), help="Number of interferers along the geostationary belt")
+@click.option("--constellation", "-c", required=False, default=None, help="Constellation file of the sattelites (a Starlink-like shell by default)")
+@click.option("--seed", required=False, default=0, type=int, help="Seed of the generator (the same seed writes the same scenario)")
+def generateCommand(outfile, users, distribution, interferers, constellation, seed):
+    """
+    Writes a synthetic scenario (see modules.generate) as an input file.
+
+    Arguments:
+        outfile {str} -- relative or full path of the input file to write
+        users {int} -- number of users
+        distribution {str} -- distribution of the users (see generate.userPositions)
+        interferers {int} -- number of interferers along the geostationary belt
+        constellation {str} -- relative or full path of a constellation file (None for the default shell)
+        seed {int} -- seed of the generator
+    """
+    shells = None
+
+    if constellation is not None:
+        try:
+            # Validate and parse the shells of the constellation
+            validateInfile(constellation)
+            shells = parseConstellation(abspath(constellation))
+        except (OSError, ValueError) as e:
+            print(e)
+            exit()
+
+    with open(outfile, 'w') as f:
+        writeScenario(generateScenario(users, shells, distribution, interferers, seed), f)
+
+@main.command("serve", help="Runs the planner as a service, keeping the plans of scenarios in memory.")
+@click.option("--host", required=False, default="127.0.0.1", help="Host to listen on (localhost by default)")
+@click.option("--port", "-p", required=False, default=8421, type=click.IntRange(0, 65535), help="Port to listen on")
+@click.option("--socket", "socketPath", required=False, default=None, help="Listens on a Unix socket at this path instead")
+@click.option("--threads", "-t", required=False, default=4, type=click.IntRange(1), help="Most requests handled at once")
+def serveCommand(host, port, socketPath, threads):
+    """
+    Runs the planner service until it is interrupted.
+
+    The service keeps the solved plans of scenarios (and their indexes) resident,
+    and answers JSON requests to load, update and query them (see modules.serve).
+
+    Arguments:
+        host {str} -- the host to listen on
+        port {int} -- the port to listen on
+        socketPath {str} -- the path of a Unix socket to listen on instead (None for TCP)
+        threads {int} -- the most requests handled at once
+    """
+    # The service is only imported when asked for, so the other commands never depend on it
+    from beamplan.modules.serve import serve
+
+    try:
+        serve(host, port, socketPath, threads)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--socket")
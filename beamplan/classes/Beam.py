@@ -18,6 +18,8 @@ class Beam:
     what it is connected to.
     """
 
+    __slots__ = ("beamID", "satteliteID", "userID", "color")
+
     def __init__(self, beamID, satteliteID, userID, color):
         """
         Initializes a Beam class to with a set of parameters.
@@ -51,4 +53,16 @@ class Beam:
         """
         Returns the userID of the beam.
         """
-        return self.userID
\ No newline at end of file
+        return self.userID
+    
+    def getBeamID(self):
+        """
+        Returns the ID of the beam (on its sattelite).
+        """
+        return self.beamID
+    
+    def getSatteliteID(self):
+        """
+        Returns the sattelite ID of the beam.
+        """
+        return self.satteliteID
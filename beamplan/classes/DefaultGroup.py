@@ -0,0 +1,41 @@
+"""
+Class definition for the DefaultGroup class.
+
+A DefaultGroup is a click command group that falls back to one of
+its commands when it is not given the name of a command, so that
+subcommands can be added without changing the original invocation.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import click
+
+class DefaultGroup(click.Group):
+    """
+    A click Group that invokes a default command when no command is named.
+
+    `beamplan infile.txt` runs the default command (i.e. `beamplan plan infile.txt`),
+    while `beamplan epochs ...` runs the named one.  Asking the group for --help still
+    lists every command.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes the DefaultGroup, with the name of its default command.
+
+        Arguments:
+            default (str) -- name of the command run when none is named (keyword only)
+        """
+        self.default = kwargs.pop("default")
+        super().__init__(*args, **kwargs)
+
+    def parse_args(self, ctx, args):
+        """
+        Names the default command in front of the arguments, unless they start with a command.
+        """
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = [self.default] + list(args)
+
+        return super().parse_args(ctx, args)
@@ -9,6 +9,8 @@ __author__ = "Robert Dekovich"
 __email__ = "dekovich@umich.edu"
 __status__ = "Development"
 
+from math import sqrt
+
 class Entity:
     """
     A parent object that exists within the ECEF coordinate space.
@@ -16,8 +18,13 @@ class Entity:
     This class possesses class functions to provide information about
     it, or relative to it when provided another instance of this class
     or a child.
+
+    Entities are slotted (no per-instance __dict__), so they stay small when
+    made in bulk, e.g. as facades over the rows of an EntityTable.
     """
 
+    __slots__ = ("id", "x", "y", "z", "type", "unit")
+
     def __init__(self, id, x, y, z, type=None):
         """
         Initializes the Entity class with it's X, Y and Z coordinates, along
@@ -36,6 +43,7 @@ class Entity:
         self.y = float(y)
         self.z = float(z)
         self.type = type
+        self.unit = None
     
     def getID(self):
         """
@@ -65,4 +73,33 @@ class Entity:
         """
         Returns the stored z-coordinate of the entity
         """
-        return self.z
\ No newline at end of file
+        return self.z
+    
+    def getPosition(self):
+        """
+        Returns the stored coordinates of the entity, as an (x, y, z) tuple
+        """
+        return (self.x, self.y, self.z)
+    
+    def getUnit(self):
+        """
+        Returns the unit vector of the entity (w.r.t the origin), computed once and cached
+        """
+        if self.unit is None:
+            magnitude = sqrt((self.x ** 2) + (self.y ** 2) + (self.z ** 2))
+            self.unit = (self.x / magnitude, self.y / magnitude, self.z / magnitude)
+        return self.unit
+    
+    def setPosition(self, x, y, z):
+        """
+        Moves the entity to the provided coordinates (and forgets the cached unit vector)
+
+        Arguments:
+            x (float) -- the new x coordinate of the entity (w.r.t the origin)
+            y (float) -- the new y coordinate of the entity (w.r.t the origin)
+            z (float) -- the new z coordinate of the entity (w.r.t the origin)
+        """
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+        self.unit = None
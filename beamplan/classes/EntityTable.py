@@ -0,0 +1,183 @@
+"""
+Class definition for the EntityTable class.
+
+An EntityTable is a compact, array-backed store of every entity of
+one kind (e.g. every user), in place of one object per entity.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from collections.abc import Mapping
+
+class EntityTable(Mapping):
+    """
+    A class representing a table of entities of one kind.
+
+    The table holds one contiguous (N, 3) float array of the x, y and z
+    coordinates, an array of the IDs, and a sorted index from ID to row
+    (about 32 to 48 bytes per entity, against a few hundred for an object
+    in a dict).
+    It behaves as a read-only mapping of ID to entity object, like the
+    mappings built by the parse module, but only makes the (slotted)
+    entity object of an ID when it is asked for one.
+    """
+
+    def __init__(self, entityClass, ids, positions):
+        """
+        Initializes the EntityTable with its IDs and positions.
+
+        Arguments:
+            entityClass (class) -- the class of the facade objects (e.g. User)
+            ids (numpy.ndarray) -- (N,) array of the unique IDs, in order
+            positions (numpy.ndarray) -- (N, 3) array of the positions, in the order of the IDs
+        """
+        self.entityClass = entityClass
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(-1, 3)
+
+        # Index the rows by ID, sorted so an ID is found with a binary search
+        # (IDs already in ascending order, the usual case, need no separate index)
+        if np.all(self.ids[1:] > self.ids[:-1]):
+            self.order = None
+            self.sortedIDs = self.ids
+        else:
+            self.order = np.argsort(self.ids, kind="stable")
+            self.sortedIDs = self.ids[self.order]
+
+        # Note if the IDs run one after another from the first, so a row is found by subtraction
+        self.firstID = int(self.ids[0]) if len(self.ids) else 0
+        self.dense = self.order is None and (len(self.ids) == 0 or int(self.ids[-1]) - self.firstID == len(self.ids) - 1)
+
+    @classmethod
+    def fromColumns(cls, entityClass, columns):
+        """
+        Returns an EntityTable of parsed columns.
+
+        Arguments:
+            entityClass (class) -- the class of the facade objects (e.g. User)
+            columns (Columns) -- the parsed columns of the kind (see parse.parseColumns)
+        """
+        return cls(entityClass, columns.ids, columns.positions)
+
+    def extended(self, ids, positions):
+        """
+        Returns a new EntityTable with the provided entities appended (after the existing rows).
+
+        Arguments:
+            ids (numpy.ndarray) -- (K,) array of the new unique IDs
+            positions (numpy.ndarray) -- (K, 3) array of the positions of the new IDs
+
+        Raises:
+            ValueError -- an ID is already in the table
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+
+        # Each new ID must be new to the table, and given once
+        unique, counts = np.unique(ids, return_counts=True)
+        for id in unique[counts > 1].tolist() + [id for id in unique.tolist() if id in self]:
+            raise ValueError("Entity {} is already in the table.".format(id))
+
+        return EntityTable(self.entityClass, np.concatenate((self.ids, ids)),
+                           np.concatenate((self.positions, np.asarray(positions, dtype=np.float64).reshape(-1, 3))))
+
+    def without(self, ids):
+        """
+        Returns a new EntityTable without the provided entities (the other rows keep their order).
+
+        Arguments:
+            ids (iterable) -- the IDs to leave out
+
+        Raises:
+            KeyError -- an ID is not in the table
+        """
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[self.rows(ids)] = False
+
+        return EntityTable(self.entityClass, self.ids[keep], self.positions[keep])
+
+    def rows(self, ids):
+        """
+        Returns the rows of the provided IDs.
+
+        Arguments:
+            ids (iterable) -- the IDs to look up
+
+        Raises:
+            KeyError -- an ID is not in the table
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+
+        if len(self.ids) == 0:
+            if len(ids):
+                raise KeyError(int(ids[0]))
+            return np.empty(0, dtype=np.int64)
+
+        # IDs numbered one after another (the usual case) are their own offsets
+        if self.dense:
+            rows = ids - self.firstID
+            if len(rows) and (rows.min() < 0 or rows.max() >= len(self.ids)):
+                raise KeyError(int(ids[(rows < 0) | (rows >= len(self.ids))][0]))
+            return rows
+
+        # Binary search each ID, and make sure it was found
+        found = np.searchsorted(self.sortedIDs, ids).clip(0, len(self.ids) - 1)
+        missing = self.sortedIDs[found] != ids
+        if missing.any():
+            raise KeyError(int(ids[missing][0]))
+
+        return found if self.order is None else self.order[found]
+
+    def row(self, id):
+        """
+        Returns the row of the provided ID.
+
+        Arguments:
+            id (int) -- the ID to look up
+
+        Raises:
+            KeyError -- the ID is not in the table
+        """
+        # IDs numbered one after another (the usual case) are their own offsets
+        if self.dense:
+            row = id - self.firstID
+            if 0 <= row < len(self.ids) and row == int(row):
+                return int(row)
+            raise KeyError(id)
+
+        found = int(self.sortedIDs.searchsorted(id))
+        if found == len(self.ids) or self.sortedIDs[found] != id:
+            raise KeyError(id)
+
+        return found if self.order is None else int(self.order[found])
+
+    def __getitem__(self, id):
+        """
+        Returns the entity object of the provided ID, made from its row.
+        """
+        x, y, z = self.positions[self.row(id)].tolist()
+        return self.entityClass(id, x, y, z)
+
+    def __contains__(self, id):
+        """
+        Returns True if the ID is in the table.
+        """
+        try:
+            self.row(id)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    def __iter__(self):
+        """
+        Iterates over the IDs of the table, in order.
+        """
+        return iter(self.ids.tolist())
+
+    def __len__(self):
+        """
+        Returns the number of entities in the table.
+        """
+        return len(self.ids)
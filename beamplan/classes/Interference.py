@@ -22,6 +22,8 @@ class Interference(Entity):
     Starlink sattelites must not be within 20 degrees of any of these.
     """
 
+    __slots__ = ()
+
     def __init__(self, id, x, y, z):
         """
         Initializes the Interference child class (Entity).
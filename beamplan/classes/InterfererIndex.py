@@ -0,0 +1,148 @@
+"""
+Class definition for the InterfererIndex class.
+
+An InterfererIndex holds, for every user, the directions in which
+the user sees the external interferers, so that checking a beam
+against them does not need a scan over every interferer.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from math import cos, radians
+
+from beamplan.classes.Entity import Entity
+from beamplan import userVisibleAngle, externalInterferenceAngle
+from beamplan.modules.measurement import isInterfered, cosExternalInterference, cosineGuardBand
+from beamplan.modules.visibility import batchSize
+from beamplan.modules.interference import unitVectors
+
+class InterfererIndex:
+    """
+    A class representing the exclusion cones of the interferers, as seen by each user.
+
+    Interferers are fixed for a scenario, so the unit vector from every user to every
+    interferer is computed once.  A sattelite can only be viable to a user within
+    userVisibleAngle of the user's vertical, so an interferer farther than
+    userVisibleAngle + externalInterferenceAngle from the vertical can never block a
+    viable sattelite, and is left out of the user's entries.  Checking a sattelite then
+    becomes a nearest-direction query over the few remaining directions of the user.
+
+    The entries are stored as a compressed row table: the directions of user i are
+    directions[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, userPositions, interferencePositions):
+        """
+        Initializes the InterfererIndex for a set of users and interferers.
+
+        Arguments:
+            userPositions (numpy.ndarray) -- (U, 3) array of user positions
+            interferencePositions (numpy.ndarray) -- (I, 3) array of interferer positions
+        """
+        self.userPositions = userPositions
+        self.interferencePositions = interferencePositions
+
+        numUsers, numInterferences = len(userPositions), len(interferencePositions)
+
+        # Cosine of the widest angle from the vertical at which an interferer can block a viable sattelite
+        cosReach = cos(radians(min(180.0, userVisibleAngle + externalInterferenceAngle + 1e-3)))
+
+        counts = np.zeros(numUsers, dtype=np.int64)
+        directions, interferences = [], []
+
+        if numInterferences:
+            # Size the batches of users so each one measures roughly batchSize pairs
+            rowsPerBatch = max(1, batchSize // numInterferences)
+
+            for start in range(0, numUsers, rowsPerBatch):
+                users = userPositions[start:start + rowsPerBatch]
+
+                # Directions from each user to every interferer, and the vertical of each user
+                toInterference = unitVectors(interferencePositions[None, :, :] - users[:, None, :])
+                vertical = unitVectors(users)
+
+                # Keep the interferers within reach of the user's visible cone (in interferer order)
+                near = ~(np.einsum("ij,ikj->ik", vertical, toInterference) <= cosReach)
+                rows, columns = np.nonzero(near)
+
+                counts[start:start + rowsPerBatch] = near.sum(axis=1)
+                directions.append(toInterference[rows, columns])
+                interferences.append(columns)
+
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.directions = np.concatenate(directions) if directions else np.empty((0, 3))
+        self.interferences = np.concatenate(interferences) if interferences else np.empty(0, dtype=np.int64)
+
+    def entries(self, userRows):
+        """
+        Returns the entries of the provided users in the compressed row table.
+
+        Arguments:
+            userRows (numpy.ndarray) -- (K,) array of user rows
+
+        Returns:
+            (tuple) -- (owners, entries, counts) arrays, where entries are the positions of the entries
+                in the table, owners are the indices (into userRows) of the user each one belongs to,
+                and counts are the number of entries of each user
+        """
+        starts = self.offsets[userRows]
+        counts = self.offsets[userRows + 1] - starts
+
+        owners = np.repeat(np.arange(len(userRows)), counts)
+        firsts = np.cumsum(counts) - counts
+        entries = np.repeat(starts - firsts, counts) + np.arange(counts.sum())
+
+        return owners, entries, counts
+
+    def blockedMask(self, userRows, sattelitePosition):
+        """
+        Determines which of the users are interfered with when served by the sattelite
+
+        The sattelite is assumed to be visible to each of the users (i.e. one of their viable
+        sattelites).  Pairs within the guard band of the interference threshold are re-measured
+        by isInterfered (given their cosine), so the result is identical to scanning every interferer.
+
+        Arguments:
+            userRows (numpy.ndarray) -- (K,) array of the rows of the users
+            sattelitePosition (numpy.ndarray) -- (3,) position of the sattelite
+
+        Returns:
+            (numpy.ndarray) -- (K,) boolean array, True where the user is interfered with
+        """
+        userRows = np.asarray(userRows, dtype=np.int64)
+        blocked = np.zeros(len(userRows), dtype=bool)
+        owners, entries, counts = self.entries(userRows)
+
+        if len(entries) == 0:
+            return blocked
+
+        # Direction from each user to the sattelite
+        toSattelite = unitVectors(sattelitePosition[None, :] - self.userPositions[userRows])
+
+        # Cosine between the sattelite and each interferer near the user's visible cone
+        cosine = np.einsum("ij,ij->i", toSattelite[owners], self.directions[entries])
+
+        # Find the direction of the nearest interferer to the sattelite, as seen by each user
+        # (the entries of each user are contiguous, so they reduce in one pass)
+        hasEntries = counts > 0
+        nearest = np.maximum.reduceat(cosine, (np.cumsum(counts) - counts)[hasEntries])
+
+        # Blocked when the nearest interferer is within the threshold (i.e. the cosine is larger)
+        blocked[hasEntries] = nearest > cosExternalInterference + cosineGuardBand
+
+        # Re-measure the pairs too close to the threshold to decide in batch
+        ambiguous = ~(np.abs(cosine - cosExternalInterference) > cosineGuardBand)
+
+        for owner, entry, value in zip(owners[ambiguous], entries[ambiguous], cosine[ambiguous].tolist()):
+            if blocked[owner]:
+                continue
+
+            user = Entity(None, *self.userPositions[userRows[owner]])
+            interference = Entity(None, *self.interferencePositions[self.interferences[entry]])
+            sattelite = Entity(None, *sattelitePosition)
+            blocked[owner] = isInterfered(user, interference, sattelite, value)
+
+        return blocked
@@ -0,0 +1,178 @@
+"""
+Class definition for the Plan class.
+
+A Plan holds the state of one beam planning of a scenario: the
+entities, the viable users of each sattelite, and the beams made,
+so that it can be kept (and updated) after it has been solved.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+
+from beamplan.classes.InterfererIndex import InterfererIndex
+from beamplan.modules.parse import buildTables
+from beamplan.modules.visibility import visibleUsersBySattelite
+from beamplan.modules.solver import solvers, streamingSolvers, parallelSolver
+from beamplan.modules.profiling import phase
+from beamplan.modules.rejection import reachability
+
+class Plan:
+    """
+    A class representing the beam plan of a scenario.
+
+    Planning runs in the same phases as the command line tool: the viable users
+    of each sattelite are found (visibility, then external interference), and the
+    beams are assigned by a solver.  The Plan keeps the tables and the mapping of
+    users to the sattelites serving them, which an incremental update (see
+    modules.replan) reads and changes in place.
+    """
+
+    def __init__(self, users, sattelites, interferences):
+        """
+        Initializes the Plan with the entities of the scenario.
+
+        Arguments:
+            users (EntityTable) -- table of the users
+            sattelites (dict) -- mapping of sattelite ID to Sattelite object
+            interferences (EntityTable) -- table of the interferers
+        """
+        self.users = users
+        self.sattelites = sattelites
+        self.interferences = interferences
+
+        # Mapping of user ID to the ID of the sattelite serving it
+        self.existing = {}
+
+        # Index of the interferers seen by each user (valid for the current tables only)
+        self.interfererIndex = None
+
+        # How far each user got through the viability checks (see modules.rejection)
+        self.reachability = None
+
+    @classmethod
+    def fromColumns(cls, columns):
+        """
+        Returns a Plan of parsed columns (see parse.parseColumns).
+
+        Arguments:
+            columns (dict) -- mapping of each kind of entity to its Columns
+        """
+        with phase("build"):
+            return cls(*buildTables(columns))
+
+    def sattelitePositions(self):
+        """
+        Returns the (S, 3) array of the positions of the sattelites, in order
+        """
+        return np.array([sattelite.getPosition() for sattelite in self.sattelites.values()],
+                        dtype=np.float64).reshape(-1, 3)
+
+    def computeViability(self):
+        """
+        Determines the viable users of every sattelite (visible, and without external interference)
+        """
+        userPositions = self.users.positions
+        sattelitePositions = self.sattelitePositions()
+
+        with phase("visibility"):
+            # Determine the users each sattelite is visible to, via a spatial index of the sattelites
+            visible = visibleUsersBySattelite(userPositions, sattelitePositions)
+
+            # For each sattelite, add its visible users as viable users (in user order)
+            for rows, sattelite in zip(visible, self.sattelites.values()):
+                sattelite.setViableUsers(self.users.ids[rows].tolist())
+
+        with phase("interference"):
+            # Index the directions each user sees the interferers in (once per scenario)
+            self.interfererIndex = InterfererIndex(userPositions, self.interferences.positions)
+            viable = []
+
+            # For each sattelite (Runtime: numSattelites * numViableUsers[N] * numNearInterference[N], batched)
+            for column, (rows, sattelite) in enumerate(zip(visible, self.sattelites.values())):
+                # Keep only the viable users without an external interference for this sattelite
+                clear = ~self.interfererIndex.blockedMask(rows, sattelitePositions[column])
+                sattelite.filterViableUsers(clear)
+                viable.append(rows[clear])
+
+        # Record which users no sattelite was visible or viable to
+        self.reachability = reachability(len(self.users), visible, viable)
+
+    def assignBeams(self, solver="greedy", workers=1, onSettled=None):
+        """
+        Connects as many beams as possible given the constraints, with the chosen solver.
+
+        Arguments:
+            solver (str) -- name of the solver used to assign the beams (see modules.solver)
+            workers (int) -- number of processes to build the beams across (1 is serial)
+            onSettled (func) -- function called with each Sattelite as soon as its beams are
+                final (see settleBeams), None for none
+
+        Returns:
+            (dict) -- mapping of user ID to the ID of the sattelite serving it
+        """
+        with phase("assign"):
+            for sattelite in self.settleBeams(solver, workers):
+                if onSettled is not None:
+                    onSettled(sattelite)
+
+        return self.existing
+
+    def settleBeams(self, solver="greedy", workers=1):
+        """
+        Connects the beams as assignBeams does, yielding each sattelite once its beams are final.
+
+        A streaming solver (see solver.streamingSolvers) run serially settles the sattelites one
+        at a time, in order; any other solver settles every sattelite at once, when it finishes.
+
+        Arguments:
+            solver (str) -- name of the solver used to assign the beams (see modules.solver)
+            workers (int) -- number of processes to build the beams across (1 is serial)
+
+        Yields:
+            (Sattelite) -- each sattelite, in order, with its final beams
+        """
+        if workers == 1 and solver in streamingSolvers:
+            yield from streamingSolvers[solver](self.users, self.sattelites, self.existing)
+            return
+
+        if workers > 1:
+            parallelSolver(self.users, self.sattelites, self.existing, workers, solver)
+        else:
+            solvers[solver](self.users, self.sattelites, self.existing)
+
+        yield from self.sattelites.values()
+
+    def seedBeams(self, previous):
+        """
+        Makes the beams of a previous plan again, where they are still valid.
+
+        Each sattelite of the previous plan first tries the users it served, in the order
+        it served them, before any solver runs (every solver keeps them).
+
+        Arguments:
+            previous (Plan) -- the plan to take the beams from
+
+        Returns:
+            (dict) -- mapping of user ID to the ID of the sattelite serving it
+        """
+        for satteliteID, sattelite in self.sattelites.items():
+            if satteliteID not in previous.sattelites:
+                continue
+
+            # Only the users that are still viable to the sattelite
+            viable = set(sattelite.getViableUsers())
+            candidates = [beam.getUserID() for beam in previous.sattelites[satteliteID].getBeams()]
+            sattelite.beamFactory(self.existing, self.users.__getitem__, [id for id in candidates if id in viable])
+
+        return self.existing
+
+    def getBeams(self):
+        """
+        Iterates over the beams of every sattelite, in the order of the sattelites
+        """
+        for sattelite in self.sattelites.values():
+            for beam in sattelite.getBeams():
+                yield beam
@@ -0,0 +1,202 @@
+"""
+Class definitions for the PlanServer classes.
+
+The planner service answers JSON requests over HTTP, on a localhost
+port or a Unix socket (where the platform has them).  Each connection is
+handled on a bounded pool of threads, rather than a new thread per connection.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import json
+import socket
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, unquote
+
+"""Flag that is true when the platform has Unix sockets (e.g. not every Windows does)"""
+unixSockets = hasattr(socket, "AF_UNIX")
+
+class PlanRequestHandler(BaseHTTPRequestHandler):
+    """
+    A class handling one HTTP request to the planner service.
+
+    The path is split into its parts, the body (if any) is read as JSON, and both are
+    handed to the respond function of the server, which returns the status and the
+    JSON payload of the response.  A KeyError is answered as 404 (not found), a
+    ValueError as 400 (bad request), and any other error as 500 (internal error), so
+    the client always gets a response.
+    """
+
+    server_version = "beamplan"
+
+    def do_GET(self):
+        """
+        Handles a GET request (reading a plan).
+        """
+        self.route("GET")
+
+    def do_POST(self):
+        """
+        Handles a POST request (loading or updating a plan).
+        """
+        self.route("POST")
+
+    def do_DELETE(self):
+        """
+        Handles a DELETE request (dropping a plan).
+        """
+        self.route("DELETE")
+
+    def route(self, method):
+        """
+        Answers the request with the respond function of the server.
+
+        Arguments:
+            method (str) -- the HTTP method of the request
+        """
+        parts = [unquote(part) for part in urlsplit(self.path).path.split("/") if part]
+
+        try:
+            status, payload = self.server.respond(method, parts, self.readBody())
+        except KeyError as e:
+            status, payload = 404, {"error": "Not found: {}".format(e)}
+        except ValueError as e:
+            status, payload = 400, {"error": "{}".format(e)}
+        except Exception as e:
+            status, payload = 500, {"error": "Internal error: {}: {}".format(type(e).__name__, e)}
+
+        self.sendJSON(status, payload)
+
+    def readBody(self):
+        """
+        Returns the JSON body of the request (an empty object if there is none).
+
+        Raises:
+            ValueError -- the body is not a JSON object
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        if length == 0:
+            return {}
+
+        body = json.loads(self.rfile.read(length).decode("utf-8"))
+        if not isinstance(body, dict):
+            raise ValueError("The body of a request must be a JSON object.")
+
+        return body
+
+    def sendJSON(self, status, payload):
+        """
+        Sends the payload as the JSON body of a response.
+
+        Arguments:
+            status (int) -- the HTTP status of the response
+            payload (dict) -- the body of the response
+        """
+        body = json.dumps(payload).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        """
+        Returns the address of the client, for the log (a Unix socket client has none).
+        """
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        """
+        Quiets the per-request log of the base class (the service runs next to a scheduler).
+        """
+
+class PooledMixIn:
+    """
+    A mixin for socketserver servers, handling each connection on a bounded pool of threads.
+
+    Connections beyond the size of the pool wait in the queue of the pool, so the number
+    of requests planned at once (and the memory they take) stays bounded.
+    """
+
+    def startPool(self, threads, respond):
+        """
+        Starts the pool of threads, and keeps the function answering the requests.
+
+        Arguments:
+            threads (int) -- the most requests handled at once
+            respond (func) -- function taking (method, parts, body), returning (status, payload)
+        """
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.respond = respond
+
+    def process_request(self, request, client_address):
+        """
+        Hands the connection to the pool (in place of handling it on the listening thread).
+        """
+        self.pool.submit(self.processInPool, request, client_address)
+
+    def processInPool(self, request, client_address):
+        """
+        Handles the connection on a thread of the pool, and closes it.
+        """
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        """
+        Stops listening, and waits for the requests being handled to finish.
+        """
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+class PlanHTTPServer(PooledMixIn, HTTPServer):
+    """
+    A class representing the planner service on a localhost (TCP) port.
+    """
+
+    def __init__(self, address, respond, threads):
+        """
+        Initializes the PlanHTTPServer, listening on the address.
+
+        Arguments:
+            address (tuple) -- the (host, port) to listen on
+            respond (func) -- function taking (method, parts, body), returning (status, payload)
+            threads (int) -- the most requests handled at once
+        """
+        HTTPServer.__init__(self, address, PlanRequestHandler)
+        self.startPool(threads, respond)
+
+class PlanUnixServer(PooledMixIn, getattr(socketserver, "UnixStreamServer", object)):
+    """
+    A class representing the planner service on a Unix socket.
+
+    The class exists on every platform, so the module always imports, but it can only be
+    made where the platform has Unix sockets.
+    """
+
+    def __init__(self, path, respond, threads):
+        """
+        Initializes the PlanUnixServer, listening on the socket path.
+
+        Arguments:
+            path (str) -- the path of the Unix socket to listen on
+            respond (func) -- function taking (method, parts, body), returning (status, payload)
+            threads (int) -- the most requests handled at once
+
+        Raises:
+            ValueError -- the platform has no Unix sockets
+        """
+        if not unixSockets:
+            raise ValueError("Unix sockets are not supported on this platform, listen on a port instead.")
+
+        socketserver.UnixStreamServer.__init__(self, path, PlanRequestHandler)
+        self.startPool(threads, respond)
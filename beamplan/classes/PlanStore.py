@@ -0,0 +1,168 @@
+"""
+Class definition for the PlanStore class.
+
+A PlanStore keeps solved plans resident in memory by name, so that a
+long-running service can update and query them without parsing or
+measuring the scenarios again.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from threading import Lock
+from time import perf_counter
+
+from beamplan.classes.Plan import Plan
+from beamplan.modules.replan import replan
+
+class PlanStore:
+    """
+    A class representing the named plans held by the planner service.
+
+    Every plan has its own lock, so requests on different plans run concurrently, while
+    requests on the same plan (which may update it in place) run one at a time.  A plan
+    is built outside of any lock, and only swapped in once it is solved.
+    """
+
+    def __init__(self):
+        """
+        Initializes the PlanStore, empty.
+        """
+        self.plans = {}
+        self.locks = {}
+
+        # Guards the two mappings above (never held while planning)
+        self.lock = Lock()
+
+    def names(self):
+        """
+        Returns the names of the plans held, in order
+        """
+        with self.lock:
+            return sorted(self.plans)
+
+    def acquire(self, name):
+        """
+        Returns the plan of the name and its lock.
+
+        Raises:
+            KeyError -- there is no plan of the name
+        """
+        with self.lock:
+            return self.plans[name], self.locks[name]
+
+    def load(self, name, columns, solver="greedy", workers=1):
+        """
+        Plans a scenario and holds it under the name (replacing any plan of the same name).
+
+        Arguments:
+            name (str) -- the name to hold the plan under
+            columns (dict) -- mapping of each kind of entity to its Columns (see parse.parseColumns)
+            solver (str) -- name of the solver used to assign the beams (see modules.solver)
+            workers (int) -- number of processes to build the beams across (1 is serial)
+
+        Returns:
+            (dict) -- the summary of the plan (see summary), with the seconds spent planning
+        """
+        start = perf_counter()
+
+        plan = Plan.fromColumns(columns)
+        plan.computeViability()
+        plan.assignBeams(solver, workers)
+
+        with self.lock:
+            self.plans[name] = plan
+            self.locks[name] = Lock()
+
+        return dict(self.summary(name), seconds=perf_counter() - start)
+
+    def remove(self, name):
+        """
+        Drops the plan of the name.
+
+        Raises:
+            KeyError -- there is no plan of the name
+        """
+        with self.lock:
+            del self.plans[name]
+            del self.locks[name]
+
+    def summary(self, name):
+        """
+        Returns the counts of the entities and beams of the plan of the name.
+
+        Raises:
+            KeyError -- there is no plan of the name
+        """
+        plan, lock = self.acquire(name)
+
+        with lock:
+            return {"name": name, "users": len(plan.users), "sattelites": len(plan.sattelites),
+                    "interferers": len(plan.interferences), "beams": len(plan.existing)}
+
+    def update(self, name, delta):
+        """
+        Applies a change to the plan of the name, in place (see replan.replan).
+
+        Arguments:
+            name (str) -- the name of the plan
+            delta (Delta) -- the change to apply
+
+        Raises:
+            KeyError -- there is no plan of the name, or the delta refers to an unknown entity
+            ValueError -- the delta adds an entity that already exists
+
+        Returns:
+            (tuple) -- (diff, seconds), the BeamDiff of the update and the seconds it took
+        """
+        plan, lock = self.acquire(name)
+
+        with lock:
+            start = perf_counter()
+            diff = replan(plan, delta)[1]
+            return diff, perf_counter() - start
+
+    def beams(self, name):
+        """
+        Returns the beams of the plan of the name, in the order of the sattelites.
+
+        Raises:
+            KeyError -- there is no plan of the name
+        """
+        plan, lock = self.acquire(name)
+
+        with lock:
+            return list(plan.getBeams())
+
+    def user(self, name, userID):
+        """
+        Returns the state of one user of the plan of the name.
+
+        Arguments:
+            name (str) -- the name of the plan
+            userID (int) -- the ID of the user
+
+        Raises:
+            KeyError -- there is no plan of the name, or no user of the ID
+
+        Returns:
+            (dict) -- the user's position, the sattelite and color serving it (None if it is
+                not served), and the sattelites it is viable to
+        """
+        plan, lock = self.acquire(name)
+
+        with lock:
+            position = plan.users.positions[plan.users.row(userID)].tolist()
+            satteliteID = plan.existing.get(userID)
+
+            color = None
+            if satteliteID is not None:
+                color = next(beam.getColor() for beam in plan.sattelites[satteliteID].getBeams()
+                             if beam.getUserID() == userID)
+
+            viable = [id for id, sattelite in plan.sattelites.items()
+                      if (np.frombuffer(sattelite.getViableUsers(), dtype=np.int64) == userID).any()]
+
+            return {"user": userID, "position": position, "sattelite": satteliteID, "color": color, "viable": viable}
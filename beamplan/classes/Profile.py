@@ -0,0 +1,153 @@
+"""
+Class definition for the Profile class.
+
+A Profile records where the time of a run goes: the wall and CPU time of
+each phase, counters of the work done (e.g. angles measured exactly), and
+the candidate users each sattelite examined and rejected (per color, where
+they are checked against the colors one at a time).
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+from contextlib import contextmanager
+from time import perf_counter, process_time
+
+from beamplan import validColorIDs
+
+class Profile:
+    """
+    A class representing the measurements of a profiled run.
+
+    Phases are timed with the phase context manager, and may repeat (e.g. once per
+    epoch), in which case their times add up and their calls are counted.  Hooks are
+    functions called at the end of every phase with its name and its wall and CPU
+    seconds, for callers that want the measurements as they happen.
+    """
+
+    def __init__(self):
+        """
+        Initializes the Profile, empty.
+        """
+
+        # Mapping of each phase to its wall seconds, CPU seconds and calls
+        self.phases = {}
+
+        # Mapping of each counter to its count
+        self.counters = {}
+
+        # Mapping of (sattelite ID, color) to the [candidates checked, candidates rejected] of the color
+        self.colorChecks = {}
+
+        # Mapping of sattelite ID to the [candidates examined, candidates rejected] of a whole coloring
+        self.candidates = {}
+
+        # Functions called at the end of every phase
+        self.hooks = []
+
+    def addHook(self, hook):
+        """
+        Adds a function to call at the end of every phase.
+
+        Arguments:
+            hook {func} -- function taking (name, wall, cpu), the phase and its seconds
+        """
+        self.hooks.append(hook)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the body of the with statement as the phase of the name.
+
+        Arguments:
+            name {str} -- the name of the phase
+        """
+        wall, cpu = perf_counter(), process_time()
+
+        try:
+            yield
+        finally:
+            wall, cpu = perf_counter() - wall, process_time() - cpu
+
+            record = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            record["wall"] += wall
+            record["cpu"] += cpu
+            record["calls"] += 1
+
+            for hook in self.hooks:
+                hook(name, wall, cpu)
+
+    def count(self, name, amount=1):
+        """
+        Adds to the counter of the name.
+
+        Arguments:
+            name {str} -- the name of the counter
+            amount {int} -- the amount to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def countColor(self, satteliteID, color, rejected):
+        """
+        Records a candidate user checked against a color of a sattelite.
+
+        Arguments:
+            satteliteID {int} -- the ID of the sattelite
+            color {str} -- the color checked
+            rejected {bool} -- whether the user conflicted with a beam of the color
+        """
+        checks = self.colorChecks.setdefault((satteliteID, color), [0, 0])
+        checks[0] += 1
+        checks[1] += rejected
+
+    def countCandidates(self, satteliteID, examined, rejected):
+        """
+        Records the candidate users a sattelite examined and rejected as a whole (e.g. colored as a graph).
+
+        Arguments:
+            satteliteID {int} -- the ID of the sattelite
+            examined {int} -- the number of candidates given a beam or rejected
+            rejected {int} -- the number of candidates rejected because every color conflicted
+        """
+        counts = self.candidates.setdefault(satteliteID, [0, 0])
+        counts[0] += examined
+        counts[1] += rejected
+
+    def report(self, peakRSS=None):
+        """
+        Returns the measurements as a JSON-ready dictionary.
+
+        Every candidate is checked against the first color, and is rejected outright
+        when it conflicts with the last, so the candidates a sattelite examined and
+        rejected are the checks of its first color and the rejections of its last,
+        added to those it examined and rejected as a whole.  The colors are None when
+        no candidate was checked against them one at a time (e.g. with the coloring
+        solver), as they were not measured.
+
+        Arguments:
+            peakRSS {int} -- the peak resident memory of the process, in bytes (None if unknown)
+
+        Returns:
+            {dict} -- the phases, the counters, the candidates examined and rejected per
+                sattelite and per color (None if not measured), and the peak resident memory
+        """
+        sattelites, colors = {}, {color: {"checked": 0, "rejected": 0} for color in validColorIDs}
+
+        for (satteliteID, color), (checked, rejected) in sorted(self.colorChecks.items()):
+            colors[color]["checked"] += checked
+            colors[color]["rejected"] += rejected
+
+            record = sattelites.setdefault(str(satteliteID), {"examined": 0, "rejected": 0})
+            if color == validColorIDs[0]:
+                record["examined"] = checked
+            if color == validColorIDs[-1]:
+                record["rejected"] = rejected
+
+        for satteliteID, (examined, rejected) in sorted(self.candidates.items()):
+            record = sattelites.setdefault(str(satteliteID), {"examined": 0, "rejected": 0})
+            record["examined"] += examined
+            record["rejected"] += rejected
+
+        return {"phases": self.phases, "counters": self.counters, "colors": colors if self.colorChecks else None,
+                "sattelites": sattelites, "peakRSS": peakRSS}
@@ -9,11 +9,16 @@ __author__ = "Robert Dekovich"
 __email__ = "dekovich@umich.edu"
 __status__ = "Development"
 
+import numpy as np
+from array import array
+from heapq import heappush, heappop
+
 from beamplan.classes.Entity import Entity
 from beamplan.classes.Beam import Beam
 
-from beamplan import beamsPerSattelite, validColorIDs, starlinkInterferenceAngle
-from beamplan.modules.measurement import calculateAngle
+from beamplan import beamsPerSattelite, validColorIDs
+from beamplan.modules.measurement import direction, beamsConflict, cosStarlinkInterference, cosineGuardBand
+from beamplan.modules.coloring import coloringWindow, candidatePositions, unitDirections, conflictMatrix, firstFitColoring, saturationColoring
 
 class Sattelite(Entity):
     """
@@ -28,8 +33,13 @@ class Sattelite(Entity):
     to a particular frequency to serve the user.  This is necessary to allow
     a single sattelite to serve users that are close to one another without
     causing interference.
+
+    The viable users are held as a compact array of user IDs, rather than a list,
+    as are the users beamFactory rejected because every color conflicted.
     """
 
+    __slots__ = ("viableUsers", "beams", "freeBeamIDs", "colorDirections", "colorUsers", "rejectedUsers")
+
     def __init__(self, id, x, y, z):
         """
         Initializes the Sattelite child class (Entity).
@@ -43,11 +53,21 @@ class Sattelite(Entity):
         
         super().__init__(id, x, y, z, "sattelite")
 
-        # Define a list of viable users this sattelite can satisfy with
-        self.viableUsers = []
+        # Define an array of viable users this sattelite can satisfy with
+        self.viableUsers = array('q')
 
         # Define a list of beams this sattelite is making
         self.beams = []
+
+        # Define a heap of the beam IDs freed by removeBeams, to be reused first
+        self.freeBeamIDs = []
+
+        # Define, per color, the unit vectors (and IDs) of the users served by beams of that color
+        self.colorDirections = {color: [] for color in validColorIDs}
+        self.colorUsers = {color: [] for color in validColorIDs}
+
+        # Define an array of the users rejected because every color conflicted
+        self.rejectedUsers = array('q')
     
     def addViableUser(self, userID):
         """
@@ -55,6 +75,23 @@ class Sattelite(Entity):
         """
         self.viableUsers.append(userID)
     
+    def setViableUsers(self, userIDs):
+        """
+        Replaces the viable users with the provided user IDs (forgetting the users rejected)
+        """
+        self.viableUsers = array('q', userIDs)
+        self.rejectedUsers = array('q')
+    
+    def filterViableUsers(self, mask):
+        """
+        Keeps only the viable users whose entry in the mask is True
+
+        Arguments:
+            mask {numpy.ndarray} -- booleans, one per viable user (in order)
+        """
+        kept = np.frombuffer(self.viableUsers, dtype=np.int64)[np.asarray(mask, dtype=bool)]
+        self.viableUsers = array('q', kept.tobytes())
+    
     def removeViableUser(self, userID):
         """
         Remove a viable user from the list of viable users
@@ -63,40 +100,140 @@ class Sattelite(Entity):
     
     def getViableUsers(self):
         """
-        Returns the list of viable users
+        Returns the array of viable users
         """
         return self.viableUsers
     
+    def getRejectedUsers(self):
+        """
+        Returns the array of users rejected because every color conflicted (repeats possible)
+        """
+        return self.rejectedUsers
+
+    def clearRejectedUsers(self):
+        """
+        Forgets the users rejected (e.g. before the beams are made again)
+        """
+        self.rejectedUsers = array('q')
+
     def getBeams(self):
         """
         Returns the list of Beams made by this sattelite.
         """
         return self.beams
     
-    def addBeam(self, userID, color):
+    def clearBeams(self):
+        """
+        Removes every beam this sattelite has made
+        """
+        self.beams = []
+        self.freeBeamIDs = []
+        self.colorDirections = {color: [] for color in validColorIDs}
+        self.colorUsers = {color: [] for color in validColorIDs}
+    
+    def addBeam(self, userID, color, direction):
         """
         Adds a single beam to the list of beams this sattelite has made
 
+        The beam takes the lowest ID freed by removeBeams, if any, or else the next one.
+
         Arguments:
             userID {int} -- ID of the user to add to the beam
             color {string} -- string representation of the color to be added
+            direction {tuple} -- unit vector from the sattelite to the user (see userDirection)
+        """
+        beamID = heappop(self.freeBeamIDs) if self.freeBeamIDs else len(self.beams) + 1
+        self.beams.append(Beam(beamID, self.id, userID, color))
+        self.colorDirections[color].append(direction)
+        self.colorUsers[color].append(userID)
+    
+    def removeBeams(self, userIDs):
+        """
+        Removes the beams serving any of the provided users, keeping the colors of the others
+
+        The remaining beams keep their IDs, and the IDs freed are reused by addBeam.
+
+        Arguments:
+            userIDs {set} -- IDs of the users whose beams are to be removed
+
+        Returns:
+            {list} -- the Beams removed
         """
-        self.beams.append(Beam(len(self.beams) + 1, self.id, userID, color))
+        removed = [beam for beam in self.beams if beam.getUserID() in userIDs]
+
+        if not removed:
+            return removed
+
+        # Keep the remaining beams (and their directions) in order, and free the IDs of the others
+        self.beams = [beam for beam in self.beams if beam.getUserID() not in userIDs]
+        for beam in removed:
+            heappush(self.freeBeamIDs, beam.beamID)
+
+        for color in validColorIDs:
+            pairs = [(direction, userID) for direction, userID
+                     in zip(self.colorDirections[color], self.colorUsers[color]) if userID not in userIDs]
+            self.colorDirections[color] = [direction for direction, _ in pairs]
+            self.colorUsers[color] = [userID for _, userID in pairs]
+
+        return removed
     
-    def beamFactory(self, existingBeams, getUser):
+    def userDirection(self, user):
+        """
+        Returns the unit vector from the sattelite to the user, as a tuple
+
+        Arguments:
+            user {Entity} -- the User object to point at
+        """
+        return direction(self, user)
+    
+    def colorConflicts(self, userID, direction, color, getUser):
+        """
+        Determines if a beam to the user would interfere with a beam of the same color.
+
+        The cosine of the angle between the user and each user served in the color is a
+        dot product of the precomputed unit vectors.  Only a pair whose cosine falls within
+        the guard band of the threshold is handed to measurement.beamsConflict, with its cosine.
+
+        Arguments:
+            userID {int} -- ID of the user to be served
+            direction {tuple} -- unit vector from the sattelite to the user
+            color {string} -- the color to be checked
+            getUser (func) -- function to retrieve the User object of a given ID
+
+        Returns:
+            {bool} -- True if the beam would interfere, False otherwise
+        """
+        dx, dy, dz = direction
+
+        for (ax, ay, az), otherID in zip(self.colorDirections[color], self.colorUsers[color]):
+            cosine = (ax * dx) + (ay * dy) + (az * dz)
+
+            # If the angle is clearly less than the maximum (i.e. the cosine is larger)
+            if cosine > cosStarlinkInterference + cosineGuardBand:
+                return True
+
+            # If the angle is too close to the maximum to decide, measure it exactly
+            if cosine >= cosStarlinkInterference - cosineGuardBand:
+                if beamsConflict(self, getUser(userID), getUser(otherID), cosine):
+                    return True
+
+        return False
+    
+    def beamFactory(self, existingBeams, getUser, candidates=None):
         """
         Creates as many possible beams given constraints, and existing connections.
 
         Arguments:
             existingBeams {dict} -- mapping of beamID to sattelite ID for bookkeeping
             getUser (func) -- function to retrieve the User object of a given ID
+            candidates {iterable} -- user IDs to try, in order (default is the viable users)
         
         Returns:
             {dict} -- updated dictionary of beams added
         """
 
-        # For each of the remaining viable users
-        for userID in self.viableUsers:
+        # For each of the remaining viable users (or the candidates given)
+        for userID in (self.viableUsers if candidates is None else candidates):
             # If there is no more room on this sattelite
             if len(self.beams) == beamsPerSattelite:
                 break
@@ -106,40 +243,89 @@ class Sattelite(Entity):
                 # Move onto the next one
                 continue
 
+            # Calculate the direction of the user once, for every color to check against
+            direction = self.userDirection(getUser(userID))
+
             # Iterate through each potential color of beam (starting with A)
             for color in validColorIDs:
-                # Create a subset of matching colors
-                matching = [beam for beam in self.beams if beam.getColor() == color]
-
-                # If the list is empty, make the beam
-                if not matching:
-                    self.addBeam(userID, color)
+                # If the beam does not interfere with any beam of the same color, make the beam
+                if not self.colorConflicts(userID, direction, color, getUser):
+                    self.addBeam(userID, color, direction)
                     existingBeams[userID] = self.id
                     break
-                else:
-                    # Define a tracker variable to determine an invariant was broken
-                    beamPossible = True
-
-                    # For each of the beams that match in color
-                    for beam in matching:
-                        # Get the User object(s) from the callback function
-                        userA = getUser(userID)
-                        userB = getUser(beam.getUserID())
-
-                        # Calculate the angle between userA and userB given the sattelite
-                        angle = calculateAngle(Entity(None, self.x, self.y, self.z, None), userA, userB)
-
-                        # If the angle is less than the maximum
-                        if angle < starlinkInterferenceAngle:
-                            # Cannot add the beam, invariant broken
-                            beamPossible = False
-                            break
-                    
-                    # If the beam is possible after constraint checking
-                    if beamPossible:
-                        # Add the beam
-                        self.addBeam(userID, color)
-                        existingBeams[userID] = self.id
+            else:
+                # Every color conflicted, record the user as rejected
+                self.rejectedUsers.append(userID)
+
+        return existingBeams
+
+    def colorFactory(self, existingBeams, users, candidates=None):
+        """
+        Creates as many possible beams given constraints, coloring the candidates as a conflict graph.
+
+        The conflicts among the unserved candidates, and with the beams already made, are
+        computed at once (see modules.coloring), over the first coloringWindow candidates,
+        doubled until a first-fit coloring of the graph fills the sattelite or every candidate
+        is in it.  If the sattelite is still left with room after users were turned away, the
+        graph is colored with the saturation heuristic instead, when that serves more.
+
+        Arguments:
+            existingBeams {dict} -- mapping of beamID to sattelite ID for bookkeeping
+            users {dict} -- mapping of user ID to User object (or an EntityTable of them)
+            candidates {iterable} -- user IDs to try, in order (default is the viable users)
+
+        Returns:
+            {dict} -- updated dictionary of beams added
+        """
+        remaining = iter(self.viableUsers if candidates is None else candidates)
+        room = beamsPerSattelite - len(self.beams)
+        getUser = users.__getitem__
+        window, size = [], coloringWindow
+
+        while room:
+            # Take the candidates not served already (by another sattelite), up to the size of the window
+            exhausted = True
+            for userID in remaining:
+                if userID not in existingBeams:
+                    window.append(userID)
+                    if len(window) == size:
+                        exhausted = False
                         break
-        
-        return existingBeams
\ No newline at end of file
+
+            if not window:
+                break
+
+            # The conflicts among the window, and the colors the beams made already rule out
+            directions = unitDirections(self, candidatePositions(users, window))
+            conflicts = conflictMatrix(self, directions, window, directions, window, getUser)
+            np.fill_diagonal(conflicts, False)
+
+            available = np.ones((len(window), len(validColorIDs)), dtype=bool)
+            for column, color in enumerate(validColorIDs):
+                if self.colorUsers[color]:
+                    available[:, column] = ~conflictMatrix(self, directions, window, np.array(self.colorDirections[color]),
+                                                           self.colorUsers[color], getUser).any(axis=1)
+
+            picks, rejected = firstFitColoring(conflicts, available, room)
+
+            # With room left and candidates to spare, take a window twice the size
+            if len(picks) < room and not exhausted:
+                size *= 2
+                continue
+
+            # With room left after turning users away, try the saturation coloring of the whole graph
+            if len(picks) < room and rejected:
+                saturated, saturatedRejected = saturationColoring(conflicts, available, room)
+                if len(saturated) > len(picks):
+                    picks, rejected = saturated, saturatedRejected
+
+            directions = directions.tolist()
+            for row, column in picks:
+                self.addBeam(window[row], validColorIDs[column], tuple(directions[row]))
+                existingBeams[window[row]] = self.id
+
+            # Every color conflicted, record the users as rejected
+            self.rejectedUsers.extend(window[row] for row in rejected)
+            break
+
+        return existingBeams
@@ -0,0 +1,154 @@
+"""
+Class definition for the SatteliteIndex class.
+
+A SatteliteIndex is a spatial index over the directions of the
+sattelites (from the center of the Earth), used to find the few
+sattelites that could possibly be visible to a user.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from math import acos, ceil, cos, radians, sin, pi
+from itertools import product
+
+from beamplan import userVisibleAngle
+
+class SatteliteIndex:
+    """
+    A class representing a bucket grid over the unit vectors of the sattelites.
+
+    Each sattelite's direction from the center of the Earth is bucketed into a
+    cubic cell of a grid over [-1, 1]^3.  A user can only see sattelites within
+    a small cone around its own direction (bounded by userVisibleAngle), so only
+    the sattelites in the neighbouring cells of the user's own cell are candidates.
+    The candidates still have to be checked with the exact visibility test.
+    """
+
+    def __init__(self, sattelitePositions, userRadius):
+        """
+        Initializes the SatteliteIndex over a set of sattelite positions.
+
+        Arguments:
+            sattelitePositions (numpy.ndarray) -- (S, 3) array of sattelite positions
+            userRadius (float) -- the (smallest) distance of the users from the origin, which
+                sizes the cells of the grid to the cone a user can see
+        """
+        self.positions = sattelitePositions
+
+        # Calculate the distance of each sattelite, and the farthest of them
+        radii = np.sqrt(np.einsum("ij,ij->i", sattelitePositions, sattelitePositions))
+        self.maxRadius = float(radii.max()) if len(radii) else 0.0
+
+        # Size the cells so the visible cone fits in a cell's neighbourhood
+        self.cellSize = max(self.coneChord(userRadius), 1e-3)
+        self.cellsPerAxis = int(ceil(2.0 / self.cellSize)) + 1
+
+        # Bucket the direction of each sattelite into a cell, and sort the sattelites by cell
+        keys = self.cellKeys(self.cells(sattelitePositions / radii[:, None]))
+        self.order = np.argsort(keys, kind="stable")
+        self.sortedKeys = keys[self.order]
+
+    def coneAngle(self, userRadius):
+        """
+        Returns the largest angle (at the origin, in radians) between a user at the given
+        distance and a sattelite that is visible to the user.
+
+        Arguments:
+            userRadius (float) -- the distance of the user from the origin
+        """
+        # The elevation (from the horizon) at which a sattelite becomes visible
+        elevation = radians(90.0 - userVisibleAngle)
+
+        # The farthest sattelite sees the widest cone, if it is above the minimum elevation at all
+        if userRadius <= 0.0 or self.maxRadius <= 0.0:
+            return pi
+
+        ratio = userRadius * cos(elevation) / self.maxRadius
+        if ratio >= 1.0:
+            return pi
+
+        return min(pi, acos(ratio) - elevation)
+
+    def coneChord(self, userRadius):
+        """
+        Returns the chord length (between unit vectors) of the cone given by coneAngle,
+        with a small margin for rounding.
+
+        Arguments:
+            userRadius (float) -- the distance of the user from the origin
+        """
+        return 2.0 * sin(self.coneAngle(userRadius) / 2.0) * (1.0 + 1e-6) + 1e-9
+
+    def cells(self, units):
+        """
+        Returns the integer (x, y, z) cell coordinates of each of the unit vectors.
+
+        Arguments:
+            units (numpy.ndarray) -- (N, 3) array of unit vectors
+        """
+        return np.clip(np.floor((units + 1.0) / self.cellSize), 0, self.cellsPerAxis - 1).astype(np.int64)
+
+    def cellKeys(self, cells):
+        """
+        Returns a single integer key of each of the cell coordinates.
+
+        The coordinates are shifted by one so the neighbours of edge cells have unique keys.
+
+        Arguments:
+            cells (numpy.ndarray) -- (N, 3) array of integer cell coordinates
+        """
+        span = self.cellsPerAxis + 2
+        shifted = cells + 1
+        return (shifted[:, 0] * span + shifted[:, 1]) * span + shifted[:, 2]
+
+    def candidates(self, userPositions):
+        """
+        Generates the candidate sattelites of the provided users, grouped by cell.
+
+        Arguments:
+            userPositions (numpy.ndarray) -- (U, 3) array of user positions
+
+        Returns:
+            (generator) -- yields (userRows, satteliteColumns) tuples, where every sattelite
+                of satteliteColumns is a candidate of every user of userRows
+        """
+        if len(userPositions) == 0 or len(self.sortedKeys) == 0:
+            return
+
+        # Calculate the distance and direction of each user
+        radii = np.sqrt(np.einsum("ij,ij->i", userPositions, userPositions))
+        cells = self.cells(userPositions / radii[:, None])
+
+        # Determine how many cells out the cone of the closest user can reach
+        reach = int(ceil(self.coneChord(float(radii.min())) / self.cellSize))
+
+        # If the cone covers the whole grid, every sattelite is a candidate of every user
+        if reach >= self.cellsPerAxis:
+            yield np.arange(len(userPositions)), np.arange(len(self.positions))
+            return
+
+        offsets = np.array(list(product(range(-reach, reach + 1), repeat=3)), dtype=np.int64)
+
+        # Group the users by the cell they fall in
+        uniqueCells, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        userOrder = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[userOrder], np.arange(len(uniqueCells) + 1))
+
+        # For each cell containing users
+        for index, cell in enumerate(uniqueCells):
+            # Look up the range of sattelites in each of the neighbouring cells
+            neighbours = self.cellKeys(np.clip(cell + offsets, -1, self.cellsPerAxis))
+            neighbours = np.unique(neighbours)
+            lower = np.searchsorted(self.sortedKeys, neighbours, side="left")
+            upper = np.searchsorted(self.sortedKeys, neighbours, side="right")
+
+            # Skip cells with no nearby sattelites
+            if not np.any(upper > lower):
+                continue
+
+            columns = np.concatenate([self.order[l:u] for l, u in zip(lower, upper) if u > l])
+            yield userOrder[bounds[index]:bounds[index + 1]], np.sort(columns)
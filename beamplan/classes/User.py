@@ -20,6 +20,8 @@ class User(Entity):
     Entity, that are solely unique to an Earth-bound user
     """
 
+    __slots__ = ()
+
     def __init__(self, id, x, y, z):
         """
         Initializes the User child class (Entity).
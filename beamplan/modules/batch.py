@@ -0,0 +1,144 @@
+"""
+Module containing the batch planning functionality for the beamplan package.
+
+Rather than a beamplan process and an evaluate.py process per scenario, run
+one after another, a batch plans and evaluates many scenarios in one command,
+spread across a pool of processes.  The result of each scenario is yielded as
+soon as it finishes, and the results are summarized at the end.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+from glob import glob
+from time import perf_counter
+from os.path import abspath
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from beamplan.classes.Plan import Plan
+from beamplan.modules.parse import parseColumns
+from beamplan.modules.cache import loadColumns
+from beamplan.modules.evaluation import evaluatePlan
+from beamplan.modules.rejection import rejectionReasons, rejectionHistogram
+from beamplan.modules.write import writePlan
+
+def expandInfiles(patterns):
+    """
+    Expands the glob patterns among the input files (a pattern matching nothing is an error).
+
+    Arguments:
+        patterns {iterable} -- paths of input files, or glob patterns of them
+
+    Raises:
+        OSError -- a pattern matched no file
+
+    Returns:
+        {list} -- the absolute paths of the input files, in order (each pattern's matches sorted)
+    """
+    infiles = []
+
+    for pattern in patterns:
+        matches = sorted(glob(pattern)) if any(c in pattern for c in "*?[") else [pattern]
+        if not matches:
+            raise OSError("No input file matches {}.".format(pattern))
+        infiles.extend(abspath(match) for match in matches)
+
+    return infiles
+
+def runScenario(infile, solver="greedy", cache=True, write=False):
+    """
+    Plans and evaluates one scenario.
+
+    Arguments:
+        infile {str} -- absolute path of the input file
+        solver {str} -- name of the solver used to assign the beams (see modules.solver)
+        cache {bool} -- flag that if true, will load the parsed scenario from the cache
+        write {bool} -- flag that if true, will write the beams to an *.out file of the infile
+
+    Returns:
+        {dict} -- the result of the scenario: the infile, the outcome of the evaluation (see
+            evaluation.Evaluation), the number of beams, the number of users unserved for each
+            reason (see rejection.rejectionHistogram), and the seconds spent reading, planning
+            and evaluating it (or the error, if it could not be read)
+    """
+    result = {"infile": infile}
+
+    try:
+        start = perf_counter()
+        columns = loadColumns(infile) if cache else parseColumns(infile)
+        result["readSeconds"] = perf_counter() - start
+    except (OSError, ValueError) as e:
+        result["error"] = "{}".format(e)
+        return result
+
+    start = perf_counter()
+    plan = Plan.fromColumns(columns)
+    plan.computeViability()
+    plan.assignBeams(solver)
+    result["planSeconds"] = perf_counter() - start
+
+    start = perf_counter()
+    result.update(evaluatePlan(plan)._asdict())
+    result["evaluateSeconds"] = perf_counter() - start
+    result["beams"] = len(plan.existing)
+    result["rejections"] = rejectionHistogram(rejectionReasons(plan))
+
+    if write:
+        with open(infile + '.out', 'w') as outfile:
+            writePlan(plan, outfile)
+
+    return result
+
+def runBatch(infiles, processes=1, solver="greedy", cache=True, write=False):
+    """
+    Plans and evaluates every scenario, yielding each result as soon as it is done.
+
+    Arguments:
+        infiles {list} -- absolute paths of the input files
+        processes {int} -- number of processes to spread the scenarios across (1 runs them here)
+        solver {str} -- name of the solver used to assign the beams (see modules.solver)
+        cache {bool} -- flag that if true, will load the parsed scenarios from the cache
+        write {bool} -- flag that if true, will write the beams to an *.out file of each infile
+
+    Yields:
+        {dict} -- the result of each scenario (see runScenario), in the order they finish
+    """
+    if processes == 1:
+        for infile in infiles:
+            yield runScenario(infile, solver, cache, write)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(runScenario, infile, solver, cache, write) for infile in infiles]
+
+        for future in as_completed(futures):
+            yield future.result()
+
+def summarize(results, seconds):
+    """
+    Summarizes the results of a batch.
+
+    Arguments:
+        results {list} -- the result of each scenario (see runScenario)
+        seconds {float} -- the seconds the whole batch took
+
+    Returns:
+        {dict} -- the counts of scenarios passed, failed and in error, the mean coverage of
+            the scenarios evaluated, the seconds taken, and the results (in infile order)
+    """
+    evaluated = [result for result in results if "error" not in result]
+    coverages = [result["coverage"] for result in evaluated if result["coverage"] is not None]
+
+    return {
+        "scenarios": len(results),
+        "passed": sum(1 for result in evaluated if result["passed"]),
+        "failed": sum(1 for result in evaluated if not result["passed"]),
+        "errors": len(results) - len(evaluated),
+        "meanCoverage": sum(coverages) / len(coverages) if coverages else None,
+        "seconds": seconds,
+        "results": sorted(results, key=lambda result: result["infile"])
+    }
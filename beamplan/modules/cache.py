@@ -0,0 +1,177 @@
+"""
+Module containing the parsed scenario cache for the beamplan package.
+
+Parsing a large text scenario is slow, so the parsed columns are kept in a
+cache directory as raw .npy arrays, keyed by a hash of the file's contents.
+A later run of the same scenario memory-maps the arrays instead of parsing.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from os import environ, listdir, makedirs, rename, utime, walk
+from os.path import expanduser, getsize, getmtime, isdir, join
+from shutil import rmtree
+from hashlib import sha256
+from tempfile import mkdtemp
+from time import time
+
+from beamplan.modules.parse import Columns, kinds, parseColumns
+
+"""The version of the cached layout (bump to invalidate old entries)"""
+cacheVersion = "1"
+
+"""The default directory of the cache (overridden by the BEAMPLAN_CACHE_DIR variable)"""
+defaultCacheDirectory = environ.get("BEAMPLAN_CACHE_DIR", join(expanduser("~"), ".cache", "beamplan"))
+
+"""The default most bytes the cache may hold (overridden by the BEAMPLAN_CACHE_BYTES variable)"""
+defaultCacheBytes = int(environ.get("BEAMPLAN_CACHE_BYTES", 1 << 30))
+
+"""The age, in seconds, after which a staging directory is taken as left by a failed write"""
+stagingMaxAge = 60 * 60
+
+"""The size of the blocks the input file is hashed in"""
+hashBlockSize = 1 << 20
+
+def contentKey(infile):
+    """
+    Returns the cache key of the input file, a hash of its contents.
+
+    Arguments:
+        infile {string} -- absolute path of the input file
+    """
+    digest = sha256(cacheVersion.encode())
+
+    with open(infile, 'rb') as f:
+        for block in iter(lambda: f.read(hashBlockSize), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def entrySize(path):
+    """
+    Returns the total size, in bytes, of the files of a cache entry.
+
+    Arguments:
+        path {string} -- path of the cache entry directory
+    """
+    return sum(getsize(join(root, name)) for root, _, names in walk(path) for name in names)
+
+def evictEntries(cacheDirectory, maxBytes):
+    """
+    Removes the least recently used cache entries until the cache holds at most maxBytes.
+
+    Staging directories older than stagingMaxAge (left by a write that was cut short) are
+    removed as well, while younger ones may still be in the middle of a write.
+
+    Arguments:
+        cacheDirectory {string} -- path of the cache directory
+        maxBytes {int} -- the most bytes the cache may hold
+    """
+    names = listdir(cacheDirectory)
+
+    # Remove the stale staging directories
+    for name in names:
+        path = join(cacheDirectory, name)
+        if name.startswith(".staging-") and isdir(path) and time() - getmtime(path) > stagingMaxAge:
+            rmtree(path, ignore_errors=True)
+
+    entries = [join(cacheDirectory, name) for name in names if not name.startswith(".")]
+    entries = sorted((getmtime(path), entrySize(path), path) for path in entries if isdir(path))
+    total = sum(size for _, size, _ in entries)
+
+    # Remove the oldest entries first (an entry is touched on every use)
+    for _, size, path in entries:
+        if total <= maxBytes:
+            break
+        rmtree(path, ignore_errors=True)
+        total -= size
+
+def readEntry(path):
+    """
+    Memory-maps the columns of a cache entry.
+
+    Arguments:
+        path {string} -- path of the cache entry directory
+
+    Returns:
+        {dict} -- mapping of each kind of entity to its (read-only) Columns
+    """
+    return {kind: Columns(np.load(join(path, kind + ".ids.npy"), mmap_mode='r'),
+                          np.load(join(path, kind + ".positions.npy"), mmap_mode='r'))
+            for kind in kinds}
+
+def writeEntry(cacheDirectory, key, columns):
+    """
+    Writes the columns as a cache entry, atomically (a partial entry is never visible).
+
+    Arguments:
+        cacheDirectory {string} -- path of the cache directory
+        key {string} -- the cache key of the entry
+        columns {dict} -- mapping of each kind of entity to its Columns
+    """
+    makedirs(cacheDirectory, exist_ok=True)
+    staging = mkdtemp(prefix=".staging-", dir=cacheDirectory)
+
+    try:
+        for kind in kinds:
+            np.save(join(staging, kind + ".ids.npy"), np.ascontiguousarray(columns[kind].ids))
+            np.save(join(staging, kind + ".positions.npy"), np.ascontiguousarray(columns[kind].positions))
+    except BaseException:
+        # The entry could not be written (e.g. the disk is full), so drop what was staged
+        rmtree(staging, ignore_errors=True)
+        raise
+
+    try:
+        rename(staging, join(cacheDirectory, key))
+    except OSError:
+        # Another run wrote the same entry first
+        rmtree(staging, ignore_errors=True)
+
+def loadColumns(infile, cacheDirectory=None, maxBytes=None):
+    """
+    Loads the columns of the input file from the cache, parsing and caching them on a miss.
+
+    The cache is best-effort: if an entry cannot be read or written, the file is simply parsed.
+
+    Arguments:
+        infile {string} -- absolute path of the input file to be parsed
+        cacheDirectory {string} -- path of the cache directory (default is defaultCacheDirectory)
+        maxBytes {int} -- the most bytes the cache may hold (default is defaultCacheBytes)
+
+    Raises:
+        OSError -- the input file could not be read
+        ValueError -- a line could not be parsed (see parse.parseLine)
+
+    Returns:
+        {dict} -- mapping of each kind of entity ("user", "sattelite", "interference") to its Columns
+    """
+    cacheDirectory = defaultCacheDirectory if cacheDirectory is None else cacheDirectory
+    maxBytes = defaultCacheBytes if maxBytes is None else maxBytes
+
+    key = contentKey(infile)
+    path = join(cacheDirectory, key)
+
+    # On a hit, mark the entry as recently used and map it
+    if isdir(path):
+        try:
+            utime(path)
+            return readEntry(path)
+        except (OSError, ValueError):
+            # A damaged entry is dropped, and rewritten below
+            rmtree(path, ignore_errors=True)
+
+    columns = parseColumns(infile)
+
+    try:
+        writeEntry(cacheDirectory, key, columns)
+        evictEntries(cacheDirectory, maxBytes)
+    except OSError:
+        pass
+
+    return columns
@@ -0,0 +1,187 @@
+"""
+Module containing the conflict graph coloring functionality for the beamplan package.
+
+Rather than trying the colors of each candidate user against the beams of a
+sattelite one pair at a time, the conflicts among the candidates (and with the
+beams already made) are computed at once from their unit vectors, as a graph.
+The graph is first colored first-fit, in the order of the candidates, as bits of
+integers.  A first-fit coloring that fills the sattelite serves the most it can,
+so only when it leaves room after turning users away (with every candidate in the
+graph) is the graph colored again with a saturation (DSatur) heuristic, keeping
+whichever coloring serves more.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from heapq import heapify, heappush, heappop
+
+from beamplan import beamsPerSattelite, numColorsPerSattelite
+from beamplan.classes.EntityTable import EntityTable
+from beamplan.modules.measurement import beamsConflict, cosStarlinkInterference, cosineGuardBand
+from beamplan.modules.visibility import stackPositions
+
+"""The number of candidate users a sattelite first builds its conflict graph over (doubled until it fills)"""
+coloringWindow = 2 * beamsPerSattelite
+
+def candidatePositions(users, userIDs):
+    """
+    Returns the positions of the provided users, from the table when there is one.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object (or an EntityTable of them)
+        userIDs {list} -- the IDs of the users, in order
+
+    Returns:
+        {numpy.ndarray} -- (N, 3) array of the positions of the users
+    """
+    if isinstance(users, EntityTable):
+        return users.positions[users.rows(userIDs)]
+
+    return stackPositions([users[userID] for userID in userIDs])
+
+def unitDirections(sattelite, positions):
+    """
+    Returns the unit vectors from the sattelite to each of the positions.
+
+    Arguments:
+        sattelite {Entity} -- the sattelite the vectors start at
+        positions {numpy.ndarray} -- (N, 3) array of the positions pointed to
+
+    Returns:
+        {numpy.ndarray} -- (N, 3) array of unit vectors
+    """
+    delta = positions - np.array([sattelite.getX(), sattelite.getY(), sattelite.getZ()])
+
+    return delta / np.sqrt(np.einsum("ij,ij->i", delta, delta))[:, None]
+
+def conflictMatrix(sattelite, directionsA, userIDsA, directionsB, userIDsB, getUser):
+    """
+    Determines which pairs of beams from the sattelite would interfere, if of the same color.
+
+    The cosines of every pair are one matrix product of the unit vectors.  Pairs that fall
+    within the guard band of the threshold are decided by beamsConflict, given their cosine, so the
+    result is always identical to checking every pair one at a time.
+
+    Arguments:
+        sattelite {Entity} -- the sattelite making the beams
+        directionsA {numpy.ndarray} -- (A, 3) unit vectors to the first users
+        userIDsA {list} -- the IDs of the first users
+        directionsB {numpy.ndarray} -- (B, 3) unit vectors to the second users
+        userIDsB {list} -- the IDs of the second users
+        getUser (func) -- function to retrieve the User object of a given ID
+
+    Returns:
+        {numpy.ndarray} -- (A, B) boolean array, True where the beams would interfere
+    """
+    cosine = directionsA @ directionsB.T
+
+    # The angle is clearly less than the maximum (i.e. the cosine is larger)
+    conflicts = cosine > cosStarlinkInterference + cosineGuardBand
+
+    # The angle is too close to the maximum to decide, measure it exactly
+    for a, b in zip(*np.nonzero(~conflicts & (cosine >= cosStarlinkInterference - cosineGuardBand))):
+        conflicts[a, b] = beamsConflict(sattelite, getUser(userIDsA[a]), getUser(userIDsB[b]), float(cosine[a, b]))
+
+    return conflicts
+
+def firstFitColoring(conflicts, available, room):
+    """
+    Colors up to room candidates of a conflict graph in order, each with its first color that fits.
+
+    The candidates ruled out of each color are held as the bits of an integer, so trying a
+    candidate is a bit test per color, and coloring it an or of its row of the graph.
+
+    Arguments:
+        conflicts {numpy.ndarray} -- (N, N) boolean adjacency of the candidates (no self loops)
+        available {numpy.ndarray} -- (N, C) boolean array of the colors each candidate can take
+        room {int} -- the most candidates to color
+
+    Returns:
+        {tuple} -- (picks, rejected), the (candidate, color) of each beam in order, and the
+            candidates tried whose every color was ruled out
+    """
+    # Pack the rows of the graph, and the candidates ruled out of each color, as little-endian bits
+    width = (len(conflicts) + 7) // 8
+    rows = np.packbits(conflicts, axis=1, bitorder="little").tobytes()
+    columns = np.packbits(~available.T, axis=1, bitorder="little").tobytes()
+    ruledOut = [int.from_bytes(columns[color * width:(color + 1) * width], "little") for color in range(numColorsPerSattelite)]
+    picks, rejected = [], []
+
+    for candidate in range(len(conflicts)):
+        for color in range(numColorsPerSattelite):
+            if not (ruledOut[color] >> candidate) & 1:
+                picks.append((candidate, color))
+                ruledOut[color] |= int.from_bytes(rows[candidate * width:(candidate + 1) * width], "little")
+                break
+        else:
+            rejected.append(candidate)
+            continue
+
+        if len(picks) == room:
+            break
+
+    return picks, rejected
+
+def saturationColoring(conflicts, available, room):
+    """
+    Colors up to room candidates of a conflict graph with the saturation (DSatur) heuristic.
+
+    The candidate with the most colors ruled out goes first, ties going to the one with the
+    most neighbours, then the first; it takes the color the fewest of its live neighbours
+    could still take.  The candidates are kept in a heap by their saturation, pushed again
+    whenever it grows (entries of an older saturation are skipped when popped).
+
+    Arguments:
+        conflicts {numpy.ndarray} -- (N, N) boolean adjacency of the candidates (no self loops)
+        available {numpy.ndarray} -- (N, C) boolean array of the colors each candidate can take
+        room {int} -- the most candidates to color
+
+    Returns:
+        {tuple} -- (picks, rejected), the (candidate, color) of each beam in the order they were
+            picked, and the candidates left without a color
+    """
+    available = available.tolist()
+    degree = conflicts.sum(axis=1).tolist()
+    saturation = [numColorsPerSattelite - sum(colors) for colors in available]
+    live = [count < numColorsPerSattelite for count in saturation]
+
+    heap = [(-saturation[candidate], -degree[candidate], candidate) for candidate in range(len(live)) if live[candidate]]
+    heapify(heap)
+    picks = []
+
+    while heap and len(picks) < room:
+        negative, _, candidate = heappop(heap)
+        if not live[candidate] or -negative != saturation[candidate]:
+            continue
+        live[candidate] = False
+
+        # The color the fewest live neighbours could still take
+        neighbours = [b for b in conflicts[candidate].nonzero()[0].tolist() if live[b]]
+        color, fewest = None, None
+        for c in range(numColorsPerSattelite):
+            if available[candidate][c]:
+                count = sum(available[b][c] for b in neighbours)
+                if fewest is None or count < fewest:
+                    color, fewest = c, count
+        picks.append((candidate, color))
+
+        # Rule the color out of the neighbours, dropping those left without a color
+        for b in neighbours:
+            if available[b][color]:
+                available[b][color] = False
+                saturation[b] += 1
+                if saturation[b] == numColorsPerSattelite:
+                    live[b] = False
+                else:
+                    heappush(heap, (-saturation[b], -degree[b], b))
+
+    picked = {candidate for candidate, _ in picks}
+    rejected = [candidate for candidate, colors in enumerate(available) if not any(colors) and candidate not in picked]
+
+    return picks, rejected
@@ -0,0 +1,129 @@
+"""
+Module containing the multi-epoch planning functionality for the beamplan package.
+
+A workload is often a sequence of scenarios, one per time step, as the
+constellation moves.  The epochs are planned one after another in the same
+process, each warm-started from the plan of the one before: the change between
+the two is applied incrementally where it can be (see modules.replan), so the
+beams that are still valid are kept and the unchanged geometry is not measured
+again.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+from time import perf_counter
+from collections import namedtuple
+
+from beamplan.classes.Plan import Plan
+from beamplan.modules.replan import replan, scenarioDelta
+
+"""The largest share of the users an epoch may change for it to be planned incrementally"""
+incrementalShare = 0.5
+
+"""
+The report of one planned epoch: its label, how it was planned ("cold", "incremental"
+or "seeded"), the seconds spent reading and planning it, the number of beams, and the
+number of users handed over to another sattelite, newly served, and no longer served.
+"""
+EpochReport = namedtuple("EpochReport", ["label", "mode", "readSeconds", "planSeconds",
+                                         "beams", "handovers", "gained", "lost"])
+
+def planEpoch(previous, columns, solver="greedy", workers=1, warm=True):
+    """
+    Plans one epoch, warm-started from the plan of the epoch before.
+
+    With the greedy solver, when the change from the previous epoch can be expressed as a
+    Delta, and it touches at most incrementalShare of the users, the previous plan is
+    updated in place (the update makes its beams greedily, see replan).  Otherwise the
+    geometry is measured in full, the previous beams that are still valid are made again,
+    and the chosen solver fills the rest.  The first epoch, or every epoch when warm is
+    False, is planned in full with the chosen solver.
+
+    Arguments:
+        previous {Plan} -- the plan of the previous epoch (None for the first)
+        columns {dict} -- mapping of each kind of entity to its Columns (see parse.parseColumns)
+        solver {str} -- name of the solver used to assign the beams
+        workers {int} -- number of processes to build the beams across (1 is serial)
+        warm {bool} -- flag that if true, warm-starts from the previous plan
+
+    Returns:
+        {tuple} -- (plan, mode), the plan of the epoch and how it was planned
+    """
+    if previous is not None and warm and solver == "greedy":
+        delta = scenarioDelta(previous, columns)
+
+        # Small enough changes are applied to the previous plan in place
+        if delta is not None and len(delta.addedUsers.ids) <= incrementalShare * max(len(columns["user"].ids), 1):
+            return replan(previous, delta)[0], "incremental"
+
+    plan = Plan.fromColumns(columns)
+    plan.computeViability()
+
+    if previous is not None and warm:
+        plan.seedBeams(previous)
+        plan.assignBeams(solver, workers)
+        return plan, "seeded"
+
+    plan.assignBeams(solver, workers)
+    return plan, "cold"
+
+def handovers(before, after):
+    """
+    Compares the users served in two epochs.
+
+    Arguments:
+        before {dict} -- mapping of user ID to the ID of the sattelite serving it, in the previous epoch
+        after {dict} -- mapping of user ID to the ID of the sattelite serving it, in this epoch
+
+    Returns:
+        {tuple} -- (handovers, gained, lost), the number of users served by another sattelite,
+            newly served, and no longer served
+    """
+    handedOver = sum(1 for userID, satteliteID in after.items() if before.get(userID, satteliteID) != satteliteID)
+    gained = sum(1 for userID in after if userID not in before)
+    lost = sum(1 for userID in before if userID not in after)
+
+    return handedOver, gained, lost
+
+def planEpochs(epochs, solver="greedy", workers=1, warm=True):
+    """
+    Plans a sequence of epochs in order, yielding each plan as soon as it is made.
+
+    The plan of an epoch may be updated in place by the next one, so it should be
+    read (e.g. written out) before the next epoch is asked for.
+
+    Arguments:
+        epochs {iterable} -- the (label, columns) of each epoch, in order (see parse.parseEpochs)
+        solver {str} -- name of the solver used to assign the beams
+        workers {int} -- number of processes to build the beams across (1 is serial)
+        warm {bool} -- flag that if true, warm-starts each epoch from the previous plan
+
+    Yields:
+        {tuple} -- (plan, report), the plan of the epoch and its EpochReport
+    """
+    plan, served = None, {}
+    epochs = iter(epochs)
+
+    while True:
+        # Read the next epoch (timed separately from planning it)
+        start = perf_counter()
+        try:
+            label, columns = next(epochs)
+        except StopIteration:
+            return
+        read = perf_counter() - start
+
+        start = perf_counter()
+        plan, mode = planEpoch(plan, columns, solver, workers, warm)
+        seconds = perf_counter() - start
+
+        # Compare the users served against the previous epoch (the plan may have been updated in place)
+        handedOver, gained, lost = handovers(served, plan.existing)
+        served = dict(plan.existing)
+
+        yield plan, EpochReport(label, mode, read, seconds, len(served), handedOver, gained, lost)
@@ -0,0 +1,393 @@
+"""
+Module containing the plan evaluation functionality for the beamplan package.
+
+The checks of bin/evaluate.py (user coverage, user visibility, self-interference
+and interferer interference) are run on a Solution, the beams of a solution laid
+out as arrays, read either from the text of a scenario and a solution (validated
+as the evaluator validates them) or from a Plan in memory.  Every check measures
+all of the beams in batched array operations, with the exact angle measured only
+within the guard band of a threshold, so the checks run in the same order, stop
+at the first failure, and reach the same verdicts as the evaluator.  The message
+of a failure gives the offending beam, then (on the lines after it) the angle the
+evaluator would print, measured exactly for that beam alone.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from collections import namedtuple
+
+from beamplan import origin, validColorIDs, beamsPerSattelite, userVisibleAngle
+from beamplan.classes.Entity import Entity
+from beamplan.modules.measurement import (calculateAngle, isVisible, isInterfered, beamsConflict, cosUserVisible,
+                                          cosExternalInterference, cosStarlinkInterference, cosineGuardBand)
+from beamplan.modules.visibility import batchSize
+from beamplan.modules.interference import unitVectors
+
+"""The beam IDs a solution may use (as the text of a solution gives them)"""
+validBeamIDs = frozenset(str(i) for i in range(1, beamsPerSattelite + 1))
+
+"""The index of each valid color ID"""
+colorIndices = {color: index for index, color in enumerate(validColorIDs)}
+
+"""
+The outcome of evaluating a plan: whether it passed every check, the name of the
+check that failed (None if it passed), a description of the failure (its lines after
+the first give the measured angle of the offending beam), the number of
+users covered, the number of users, and the percentage covered (as evaluate.py
+reports it, None if there are no users).
+"""
+Evaluation = namedtuple("Evaluation", ["passed", "failed", "message", "covered", "users", "coverage"])
+
+"""
+The entities of a scenario: a mapping of the ID of each user, sattelite and interferer
+to its row, and the (N, 3) array of the positions of each kind by row.
+"""
+Scenario = namedtuple("Scenario", ["users", "userPositions", "sattelites", "sattelitePositions",
+                                   "interferences", "interferencePositions"])
+
+"""
+The beams of a solution, in the order the evaluator checks them (grouped by sattelite,
+in the order each sattelite first appears): the sattelite, beam and user IDs of each
+beam (to report failures by), the color index, user row and sattelite row of each beam
+(as arrays), the (B, 3) positions of the user and the sattelite of each beam, and the
+number of users, the interferer IDs and the (I, 3) interferer positions of the scenario.
+"""
+Solution = namedtuple("Solution", ["satteliteIDs", "beamIDs", "userIDs", "colors", "userRows", "satteliteRows",
+                                   "userPositions", "sattelitePositions", "numUsers",
+                                   "interferenceIDs", "interferencePositions"])
+
+def readScenario(lines):
+    """
+    Reads the entities of a scenario, validating the lines as evaluate.py does.
+
+    Arguments:
+        lines {iterable} -- the lines of the scenario
+
+    Raises:
+        ValueError -- a line is not a comment, a blank line, or an entity
+
+    Returns:
+        {Scenario} -- the entities of the scenario (a repeated ID keeps its last position)
+    """
+    tables = {kind: ({}, []) for kind in ("interferer", "sat", "user")}
+
+    for line in lines:
+        if "#" in line or line.strip() == "":
+            continue
+
+        # Classify the line in the order of the evaluator
+        kind = next((kind for kind in tables if kind in line), None)
+        parts = line.split()
+
+        if kind is None or parts[0] != kind or len(parts) != 5:
+            raise ValueError("Invalid line! " + line.rstrip("\n"))
+
+        try:
+            position = (float(parts[2]), float(parts[3]), float(parts[4]))
+        except ValueError:
+            raise ValueError("Can't parse location! " + line.rstrip("\n"))
+
+        # Keep the first row of an ID, with its last position
+        rows, positions = tables[kind]
+        if parts[1] in rows:
+            positions[rows[parts[1]]] = position
+        else:
+            rows[parts[1]] = len(positions)
+            positions.append(position)
+
+    def table(kind):
+        rows, positions = tables[kind]
+        return rows, np.array(positions, dtype=np.float64).reshape(-1, 3)
+
+    return Scenario(*table("user"), *table("sat"), *table("interferer"))
+
+def readSolution(lines, scenario):
+    """
+    Reads the beams of a solution, validating the lines against the scenario as evaluate.py does.
+
+    Arguments:
+        lines {iterable} -- the lines of the solution
+        scenario {Scenario} -- the scenario the solution is for
+
+    Raises:
+        ValueError -- a line is not a comment, a blank line, or a valid beam
+
+    Returns:
+        {Solution} -- the beams of the solution
+    """
+    satteliteIDs, beamIDs, userIDs, colors = [], [], [], []
+    allocated = set()
+
+    for line in lines:
+        parts = line.split()
+
+        if "#" in line or len(parts) == 0:
+            continue
+
+        # Every beam is of the form 'sat ID beam ID user ID color ID'
+        if len(parts) != 8 or parts[0] != "sat" or parts[2] != "beam" or parts[4] != "user" or parts[6] != "color":
+            raise ValueError("Invalid line! " + line.rstrip("\n"))
+
+        satteliteID, beamID, userID, color = parts[1], parts[3], parts[5], parts[7]
+
+        if satteliteID not in scenario.sattelites:
+            raise ValueError("Referenced an invalid sat id! " + line.rstrip("\n"))
+        if userID not in scenario.users:
+            raise ValueError("Referenced an invalid user id! " + line.rstrip("\n"))
+        if beamID not in validBeamIDs:
+            raise ValueError("Referenced an invalid beam id! " + line.rstrip("\n"))
+        if color not in colorIndices:
+            raise ValueError("Referenced an invalid color! " + line.rstrip("\n"))
+        if (satteliteID, beamID) in allocated:
+            raise ValueError("Beam is allocated multiple times! " + line.rstrip("\n"))
+
+        allocated.add((satteliteID, beamID))
+        satteliteIDs.append(satteliteID)
+        beamIDs.append(beamID)
+        userIDs.append(userID)
+        colors.append(colorIndices[color])
+
+    satteliteRows = np.array([scenario.sattelites[id] for id in satteliteIDs], dtype=np.int64)
+    userRows = np.array([scenario.users[id] for id in userIDs], dtype=np.int64)
+
+    # Group the beams by sattelite, in the order each sattelite first appears (as the evaluator does)
+    order = np.arange(len(satteliteRows))
+    if len(satteliteRows):
+        _, first, inverse = np.unique(satteliteRows, return_index=True, return_inverse=True)
+        order = np.argsort(first[inverse], kind="stable")
+
+    return Solution([satteliteIDs[i] for i in order], [beamIDs[i] for i in order], [userIDs[i] for i in order],
+                    np.array(colors, dtype=np.int8)[order], userRows[order], satteliteRows[order],
+                    scenario.userPositions[userRows[order]], scenario.sattelitePositions[satteliteRows[order]],
+                    len(scenario.users), list(scenario.interferences), scenario.interferencePositions)
+
+def planSolution(plan):
+    """
+    Lays out the beams of a plan as a Solution.
+
+    Arguments:
+        plan {Plan} -- the plan to lay out
+
+    Returns:
+        {Solution} -- the beams of the plan, in the order of the sattelites
+    """
+    beams = list(plan.getBeams())
+    satteliteIDs = [beam.getSatteliteID() for beam in beams]
+    userIDs = [beam.getUserID() for beam in beams]
+
+    # Rows of the sattelites, by the order of the sattelites of the plan
+    satteliteRow = {id: row for row, id in enumerate(plan.sattelites)}
+    satteliteRows = np.array([satteliteRow[id] for id in satteliteIDs], dtype=np.int64)
+    userRows = plan.users.rows(userIDs) if beams else np.zeros(0, dtype=np.int64)
+
+    return Solution(satteliteIDs, [beam.getBeamID() for beam in beams], userIDs,
+                    np.array([colorIndices[beam.getColor()] for beam in beams], dtype=np.int8),
+                    userRows, satteliteRows, plan.users.positions[userRows],
+                    plan.sattelitePositions()[satteliteRows], len(plan.users),
+                    list(plan.interferences), plan.interferences.positions)
+
+def checkCoverage(solution):
+    """
+    Checks that no user is served by more than one beam.
+
+    Arguments:
+        solution {Solution} -- the solution to check
+
+    Returns:
+        {tuple} -- (passed, message, covered), the verdict, a description of the failure
+            (None if it passed), and the number of users covered (before the failure, if any)
+    """
+    if len(solution.userRows) == 0:
+        return True, None, 0
+
+    # The first beam of each user; every other beam serves a user already covered
+    _, first = np.unique(solution.userRows, return_index=True)
+    repeated = np.ones(len(solution.userRows), dtype=bool)
+    repeated[first] = False
+
+    if repeated.any():
+        beam = int(np.argmax(repeated))
+        return False, "User {} is covered multiple times by solution!".format(solution.userIDs[beam]), beam
+
+    return True, None, len(first)
+
+def checkVisibility(solution):
+    """
+    Checks that every user can see the sattelite serving it.
+
+    Arguments:
+        solution {Solution} -- the solution to check
+
+    Returns:
+        {tuple} -- (passed, message), the verdict and a description of the failure (None if it passed)
+    """
+    for start in range(0, len(solution.userRows), batchSize):
+        users = solution.userPositions[start:start + batchSize]
+        sattelites = solution.sattelitePositions[start:start + batchSize]
+
+        # Cosine of the origin-user-sattelite angle of every beam
+        cosine = np.einsum("ij,ij->i", unitVectors(-users), unitVectors(sattelites - users))
+
+        # Visible when the angle is greater than the threshold (i.e. the cosine is smaller)
+        visible = cosine < cosUserVisible
+
+        # Re-measure the beams too close to the threshold to decide in batch
+        for row in np.flatnonzero(~(np.abs(cosine - cosUserVisible) > cosineGuardBand)):
+            visible[row] = isVisible(Entity(None, *users[row]), Entity(None, *sattelites[row]), float(cosine[row]))
+
+        if not visible.all():
+            beam = start + int(np.argmin(visible))
+
+            # The elevation of the sattelite, from the origin-user-sattelite angle
+            angle = calculateAngle(Entity(None, *solution.userPositions[beam]), origin,
+                                   Entity(None, *solution.sattelitePositions[beam]))
+            return False, "Sat {} outside of user {}'s field of view.\n{} degrees elevation.\n(Min: {} degrees elevation.)".format(
+                solution.satteliteIDs[beam], solution.userIDs[beam], angle - 90, 90 - userVisibleAngle)
+
+    return True, None
+
+def checkSelfInterference(solution):
+    """
+    Checks that no two beams of the same color of a sattelite are too close together.
+
+    The beams are grouped by sattelite and color, and only the pairs within a group are
+    compared: the i-th beam of the grouped order against the (i + k)-th, for every offset k
+    up to the size of the largest group, each offset in one array operation.
+
+    Arguments:
+        solution {Solution} -- the solution to check
+
+    Returns:
+        {tuple} -- (passed, message), the verdict and a description of the failure (None if it passed)
+    """
+    numBeams = len(solution.userRows)
+    if numBeams < 2:
+        return True, None
+
+    # Order the beams by sattelite and color, keeping the order of the solution within a group
+    order = np.lexsort((np.arange(numBeams), solution.colors, solution.satteliteRows))
+    groups = solution.satteliteRows[order] * len(validColorIDs) + solution.colors[order]
+    users = solution.userPositions[order]
+    sattelites = solution.sattelitePositions[order]
+    directions = unitVectors(users - sattelites)
+
+    # The size of the largest group bounds the offsets of the pairs within a group
+    largest = int(np.max(np.unique(groups, return_counts=True)[1]))
+    conflicts = []
+
+    for offset in range(1, largest):
+        pairs = np.flatnonzero(groups[:-offset] == groups[offset:])
+        if len(pairs) == 0:
+            continue
+
+        # Cosine of the user-sattelite-user angle of every pair at the offset
+        cosine = np.einsum("ij,ij->i", directions[pairs], directions[pairs + offset])
+
+        # Only the pairs not clearly apart are decided pair by pair (measured exactly near the threshold)
+        for pair, value in zip(pairs[~(cosine < cosStarlinkInterference - cosineGuardBand)],
+                               cosine[~(cosine < cosStarlinkInterference - cosineGuardBand)]):
+            if beamsConflict(Entity(None, *sattelites[pair]), Entity(None, *users[pair]),
+                             Entity(None, *users[pair + offset]), float(value)):
+                conflicts.append(sorted((int(order[pair]), int(order[pair + offset]))))
+
+    if not conflicts:
+        return True, None
+
+    # Report the first pair the evaluator would find, with the angle between its beams
+    i, j = min(conflicts)
+    angle = calculateAngle(Entity(None, *solution.sattelitePositions[i]), Entity(None, *solution.userPositions[i]),
+                           Entity(None, *solution.userPositions[j]))
+    return False, "Sat {} beams {} and {} interfere.\nBeam angle: {} degrees.".format(
+        solution.satteliteIDs[i], solution.beamIDs[i], solution.beamIDs[j], angle)
+
+def checkInterfererInterference(solution):
+    """
+    Checks that no user sees an interferer too close to the sattelite serving it.
+
+    Arguments:
+        solution {Solution} -- the solution to check
+
+    Returns:
+        {tuple} -- (passed, message), the verdict and a description of the failure (None if it passed)
+    """
+    interferences = solution.interferencePositions
+    if len(interferences) == 0:
+        return True, None
+
+    # Size the batches of beams so each one measures roughly batchSize pairs
+    rowsPerBatch = max(1, batchSize // len(interferences))
+
+    for start in range(0, len(solution.userRows), rowsPerBatch):
+        users = solution.userPositions[start:start + rowsPerBatch]
+        sattelites = solution.sattelitePositions[start:start + rowsPerBatch]
+
+        # Cosine of the sattelite-user-interferer angle of every beam and interferer
+        toSattelite = unitVectors(sattelites - users)
+        toInterference = unitVectors(interferences[None, :, :] - users[:, None, :])
+        cosine = np.einsum("ij,ikj->ik", toSattelite, toInterference)
+
+        # Interfered with when the angle is less than the threshold (i.e. the cosine is larger)
+        interfered = cosine > cosExternalInterference
+
+        # Re-measure the pairs too close to the threshold to decide in batch
+        for row, column in zip(*np.nonzero(~(np.abs(cosine - cosExternalInterference) > cosineGuardBand))):
+            interfered[row, column] = isInterfered(Entity(None, *users[row]), Entity(None, *interferences[column]),
+                                                   Entity(None, *sattelites[row]), float(cosine[row, column]))
+
+        if interfered.any():
+            row = int(np.argmax(interfered.any(axis=1)))
+            beam, interference = start + row, int(np.argmax(interfered[row]))
+
+            # The angle between the sattelite and the interferer, as seen by the user
+            angle = calculateAngle(Entity(None, *solution.userPositions[beam]), Entity(None, *solution.sattelitePositions[beam]),
+                                   Entity(None, *interferences[interference]))
+            return False, "Sat {} beam {} interferes with non-Starlink sat {}.\nAngle of separation: {} degrees.".format(
+                solution.satteliteIDs[beam], solution.beamIDs[beam], solution.interferenceIDs[interference], angle)
+
+    return True, None
+
+"""The checks run after the coverage check, in the order of evaluate.py, by name"""
+checks = (("visibility", checkVisibility), ("selfInterference", checkSelfInterference),
+          ("interfererInterference", checkInterfererInterference))
+
+def evaluateSolution(solution):
+    """
+    Runs every check on the solution, in the order of evaluate.py, stopping at the first failure.
+
+    Arguments:
+        solution {Solution} -- the solution to evaluate
+
+    Returns:
+        {Evaluation} -- the outcome of the checks, and the coverage of the solution
+    """
+    passed, message, covered = checkCoverage(solution)
+    users = solution.numUsers
+    coverage = (covered / users) * 100 if users else None
+
+    if not passed:
+        return Evaluation(False, "coverage", message, covered, users, coverage)
+
+    for name, check in checks:
+        passed, message = check(solution)
+        if not passed:
+            return Evaluation(False, name, message, covered, users, coverage)
+
+    return Evaluation(True, None, None, covered, users, coverage)
+
+def evaluatePlan(plan):
+    """
+    Runs every check on the plan, in the order of evaluate.py, stopping at the first failure.
+
+    Arguments:
+        plan {Plan} -- the plan to evaluate
+
+    Returns:
+        {Evaluation} -- the outcome of the checks, and the coverage of the plan
+    """
+    return evaluateSolution(planSolution(plan))
@@ -0,0 +1,152 @@
+"""
+Module containing the synthetic scenario generation functionality for the beamplan package.
+
+Rather than the fixed files of var/tests, a scenario of any size is drawn from a
+seeded random generator: the sattelites are propagated from constellation shells,
+the users are spread over the surface of the Earth (uniformly, in clusters, or
+around the poles), and the interferers are spaced along the geostationary belt.
+The same seed always draws the same scenario, so runs can be compared.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+
+from beamplan.modules.parse import Columns
+from beamplan.modules.propagate import Shell, earthRadius, propagate
+
+"""The radius of the geostationary belt the interferers are spaced along, in kilometers (as in var/tests)"""
+geoRadius = 42157.0
+
+"""The distributions the users can be drawn from"""
+distributions = ("uniform", "clustered", "polar")
+
+"""The constellation drawn when none is given (a Starlink-like shell of 72 planes of 22 sattelites)"""
+defaultShells = [Shell(550.0, 53.0, 72, 22, 39, 0.0)]
+
+"""The number of clusters, and their angular spread (standard deviation, in degrees), of clustered users"""
+numClusters = 64
+clusterSpread = 3.0
+
+"""The latitude (in degrees, north and south) beyond which polar users are drawn"""
+polarLatitude = 60.0
+
+def surfacePoints(latitudes, longitudes):
+    """
+    Returns the ECEF positions of points on the surface of the Earth.
+
+    Arguments:
+        latitudes {numpy.ndarray} -- (N,) array of the latitudes, in radians
+        longitudes {numpy.ndarray} -- (N,) array of the longitudes, in radians
+
+    Returns:
+        {numpy.ndarray} -- (N, 3) array of the x, y and z coordinates of each point
+    """
+    positions = np.empty((len(latitudes), 3))
+    positions[:, 0] = earthRadius * np.cos(latitudes) * np.cos(longitudes)
+    positions[:, 1] = earthRadius * np.cos(latitudes) * np.sin(longitudes)
+    positions[:, 2] = earthRadius * np.sin(latitudes)
+
+    return positions
+
+def userPositions(rng, count, distribution="uniform"):
+    """
+    Draws the positions of the users on the surface of the Earth.
+
+    Arguments:
+        rng {numpy.random.Generator} -- the seeded generator to draw from
+        count {int} -- the number of users
+        distribution {str} -- "uniform" (over the whole surface), "clustered" (around
+            numClusters random centers) or "polar" (beyond polarLatitude, north and south)
+
+    Raises:
+        ValueError -- the distribution is unknown
+
+    Returns:
+        {numpy.ndarray} -- (count, 3) array of the x, y and z coordinates of each user
+    """
+    longitudes = rng.uniform(-np.pi, np.pi, count)
+
+    if distribution == "uniform":
+        # Uniform over the sphere: the sine of the latitude is uniform
+        return surfacePoints(np.arcsin(rng.uniform(-1.0, 1.0, count)), longitudes)
+    elif distribution == "polar":
+        # Uniform over the two caps beyond the polar latitude
+        sines = rng.uniform(np.sin(np.radians(polarLatitude)), 1.0, count) * rng.choice((-1.0, 1.0), count)
+        return surfacePoints(np.arcsin(sines), longitudes)
+    elif distribution == "clustered":
+        # Each user is scattered about one of the centers (drawn uniformly over the sphere)
+        centers = surfacePoints(np.arcsin(rng.uniform(-1.0, 1.0, numClusters)),
+                                rng.uniform(-np.pi, np.pi, numClusters))
+        scatter = rng.normal(0.0, np.radians(clusterSpread) * earthRadius, (count, 3))
+        positions = centers[rng.integers(0, numClusters, count)] + scatter
+
+        # Project the scattered users back onto the surface
+        return positions * (earthRadius / np.linalg.norm(positions, axis=1))[:, None]
+
+    raise ValueError("Unknown distribution of users: {}.".format(distribution))
+
+def geoInterferers(rng, count):
+    """
+    Spaces the interferers evenly along the geostationary belt, from a random longitude.
+
+    Arguments:
+        rng {numpy.random.Generator} -- the seeded generator to draw from
+        count {int} -- the number of interferers
+
+    Returns:
+        {numpy.ndarray} -- (count, 3) array of the x, y and z coordinates of each interferer
+    """
+    longitudes = rng.uniform(0.0, 2.0 * np.pi) + (2.0 * np.pi * np.arange(count) / max(count, 1))
+
+    return np.stack([geoRadius * np.cos(longitudes), geoRadius * np.sin(longitudes), np.zeros(count)], axis=1)
+
+def generateScenario(users, shells=None, distribution="uniform", interferers=36, seed=0, time=0.0):
+    """
+    Draws a synthetic scenario.
+
+    Arguments:
+        users {int} -- the number of users
+        shells {list} -- the Shells of the constellation (None for defaultShells)
+        distribution {str} -- the distribution of the users (see userPositions)
+        interferers {int} -- the number of interferers along the geostationary belt
+        seed {int} -- the seed of the generator (the same seed draws the same scenario)
+        time {float} -- the time the sattelites are propagated to, in seconds from time zero
+
+    Raises:
+        ValueError -- the distribution is unknown
+
+    Returns:
+        {dict} -- mapping of each kind of entity to its Columns (see parse.parseColumns),
+            every kind numbered from 1
+    """
+    rng = np.random.default_rng(seed)
+    sattelites = propagate(defaultShells if shells is None else shells, [time])[0]
+
+    def numbered(positions):
+        return Columns(np.arange(1, len(positions) + 1, dtype=np.int64), np.ascontiguousarray(positions))
+
+    return {
+        "user": numbered(userPositions(rng, users, distribution)),
+        "sattelite": numbered(sattelites),
+        "interference": numbered(geoInterferers(rng, interferers))
+    }
+
+def writeScenario(columns, outfile):
+    """
+    Writes a scenario as an input file.
+
+    Arguments:
+        columns {dict} -- mapping of each kind of entity to its Columns (see parse.parseColumns)
+        outfile {file} -- the open file to write the scenario to
+    """
+    for kind, keyword in (("sattelite", "sat"), ("user", "user"), ("interference", "interferer")):
+        ids, positions = columns[kind]
+
+        for id, (x, y, z) in zip(ids.tolist(), positions.tolist()):
+            outfile.write("{} {} {} {} {}\n".format(keyword, id, x, y, z))
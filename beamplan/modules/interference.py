@@ -0,0 +1,90 @@
+"""
+Module containing the vectorized external interference functionality for the beamplan package.
+
+Rather than measuring the angle between a sattelite and each interferer for one
+user at a time, every viable user of a sattelite is measured against every
+interferer in batched array operations.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+
+from beamplan.classes.Entity import Entity
+from beamplan.modules.measurement import isInterfered, cosExternalInterference, cosineGuardBand
+from beamplan.modules.visibility import batchSize
+
+def unitVectors(vectors):
+    """
+    Normalizes each of the vectors along the last axis of the array.
+
+    Arguments:
+        vectors (numpy.ndarray) -- (..., 3) array of vectors
+
+    Returns:
+        (numpy.ndarray) -- (..., 3) array of unit vectors
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return vectors / np.sqrt(np.einsum("...i,...i->...", vectors, vectors))[..., None]
+
+def interferenceMask(userPositions, sattelitePosition, interferencePositions):
+    """
+    Determines which users can be served by the sattelite without external interference
+
+    For each user, the cosines of the angles between the direction to the sattelite and the
+    directions to every interferer are computed at once, and compared against the cosine of
+    the interference threshold.  Pairs that fall within the guard band of the threshold are
+    decided by isInterfered, given their cosine, so the result is always identical to calling
+    isExternalInterference on every pair.
+
+    Arguments:
+        userPositions (numpy.ndarray) -- (U, 3) array of the positions of the users
+        sattelitePosition (numpy.ndarray) -- (3,) position of the sattelite
+        interferencePositions (numpy.ndarray) -- (I, 3) array of the positions of the interferers
+
+    Returns:
+        (numpy.ndarray) -- (U,) boolean array, True where the user is not interfered with
+    """
+    numUsers, numInterferences = len(userPositions), len(interferencePositions)
+    mask = np.ones(numUsers, dtype=bool)
+
+    if numUsers == 0 or numInterferences == 0:
+        return mask
+
+    # Size the batches of users so each one measures roughly batchSize pairs
+    rowsPerBatch = max(1, batchSize // numInterferences)
+
+    for start in range(0, numUsers, rowsPerBatch):
+        users = userPositions[start:start + rowsPerBatch]
+
+        # Directions from each user to the sattelite, and from each user to every interferer
+        toSattelite = unitVectors(sattelitePosition[None, :] - users)
+        toInterference = unitVectors(interferencePositions[None, :, :] - users[:, None, :])
+
+        # Cosine of the sattelite-user-interferer angle of every pair
+        cosine = np.einsum("ij,ikj->ik", toSattelite, toInterference)
+
+        # Interfered with when the angle is less than the threshold (i.e. the cosine is larger)
+        blocked = np.any(cosine > cosExternalInterference + cosineGuardBand, axis=1)
+
+        # Re-measure the pairs too close to the threshold to decide in batch
+        ambiguous = ~(np.abs(cosine - cosExternalInterference) > cosineGuardBand)
+        ambiguous[blocked] = False
+
+        for row, column in zip(*np.nonzero(ambiguous)):
+            if blocked[row]:
+                continue
+
+            user = Entity(None, *users[row])
+            interference = Entity(None, *interferencePositions[column])
+            sattelite = Entity(None, *sattelitePosition)
+            blocked[row] = isInterfered(user, interference, sattelite, float(cosine[row, column]))
+
+        mask[start:start + rowsPerBatch] = ~blocked
+
+    return mask
@@ -1,6 +1,14 @@
 """
 Module containing the relevant measurement functionality for the beamplan package.
 
+Every constraint of the problem compares an angle against a fixed threshold, so
+besides the exact angle measurements, the module provides predicates that compare
+the cosine of the angle (a dot product of unit vectors) against the precomputed
+cosine of the threshold instead.  Within a narrow guard band of the threshold the
+predicates fall back to the exact measurement, so their results always match it.
+The vectorized checks compare whole arrays of cosines against the same thresholds,
+and hand the pairs within the guard band to the predicates, with their cosines.
+
 The following are functions that are to be used exclusively for the beamplan
 package, and thus cannot be invoked via interpreter, but rather imported.
 """
@@ -10,9 +18,25 @@ __email__ = "dekovich@umich.edu"
 __status__ = "Development"
 
 from beamplan.classes.Entity import Entity
-from beamplan import origin, userVisibleAngle, externalInterferenceAngle
+from beamplan import origin, userVisibleAngle, externalInterferenceAngle, starlinkInterferenceAngle
+
+from math import sqrt, acos, cos, degrees, radians
+from warnings import warn
+
+"""
+The band around a cosine threshold in which a cosine is not trusted to decide a
+comparison, and the angle is instead measured exactly (with calculateAngle)
+"""
+cosineGuardBand = 1e-9
+
+"""The cosine of the origin-user-sattelite angle at which a sattelite becomes visible"""
+cosUserVisible = cos(radians(180.0 - userVisibleAngle))
+
+"""The cosine of the sattelite-user-interferer angle below which a beam is interfered with"""
+cosExternalInterference = cos(radians(externalInterferenceAngle))
 
-from math import sqrt, acos, degrees, floor, pow
+"""The cosine of the user-sattelite-user angle below which two beams of the same color interfere"""
+cosStarlinkInterference = cos(radians(starlinkInterferenceAngle))
 
 def calculateAngle(v: Entity, a: Entity, b: Entity):
     """
@@ -45,9 +69,9 @@ def calculateAngle(v: Entity, a: Entity, b: Entity):
     # Bound the dot product to prevent not being able to take acos (per evaluate.py)
     dotProductBoundAB = min(1.0, max(-1.0, dotProductAB))
 
-    # Be verbose if the acos cannot be taken with the dot product
+    # Be verbose if the acos cannot be taken with the dot product (as a warning, off of standard out)
     if abs(dotProductBoundAB - dotProductAB) > 0.000001:
-        print("# Notice: Dot product {} was bounded to {}".format(dotProductAB, dotProductBoundAB))
+        warn("Dot product {} was bounded to {}".format(dotProductAB, dotProductBoundAB), RuntimeWarning)
     
     return degrees(acos(dotProductBoundAB))
 
@@ -78,4 +102,104 @@ def isExternalInterference(user: Entity, interference: Entity, sattelite: Entity
     Returns:
         (boolean) -- True if there is an interference, False if there is not
     """
-    return calculateAngle(user, sattelite, interference) < externalInterferenceAngle
\ No newline at end of file
+    return calculateAngle(user, sattelite, interference) < externalInterferenceAngle
+
+def direction(a: Entity, b: Entity):
+    """
+    Calculates the unit vector pointing from (point) a to (point) b
+
+    The components are computed exactly as calculateAngle computes its norms.
+
+    Arguments:
+        a (Entity) -- the point the vector starts at
+        b (Entity) -- the point the vector points to
+
+    Returns:
+        (tuple) -- the (x, y, z) unit vector
+    """
+    delta = (b.getX() - a.getX(), b.getY() - a.getY(), b.getZ() - a.getZ())
+    magnitude = sqrt((delta[0] ** 2) + (delta[1] ** 2) + (delta[2] ** 2))
+
+    return (delta[0] / magnitude, delta[1] / magnitude, delta[2] / magnitude)
+
+def dot(a, b):
+    """
+    Calculates the dot product of two vectors (as tuples)
+    """
+    return (a[0] * b[0]) + (a[1] * b[1]) + (a[2] * b[2])
+
+def isVisible(user: Entity, sattelite: Entity, cosine=None):
+    """
+    Determines if the sattelite is visible to the user (same result as satteliteIsVisible)
+
+    Uses the user's cached unit vector (the direction of the origin, reversed) and the
+    direction to the sattelite, and only measures the angle near the threshold.
+
+    Arguments:
+        user (Entity) -- user object for the user in question
+        sattelite (Entity) -- sattelite object in question
+        cosine (float) -- cosine of the origin-user-sattelite angle, if already computed
+            (default is None, to compute it from the unit vectors)
+
+    Returns:
+        (boolean) -- True if the sattelite is visible to the user, False otherwise
+    """
+    if cosine is None:
+        cosine = -dot(user.getUnit(), direction(user, sattelite))
+
+    if cosine < cosUserVisible - cosineGuardBand:
+        return True
+    elif cosine > cosUserVisible + cosineGuardBand:
+        return False
+
+    return satteliteIsVisible(user, sattelite)
+
+def isInterfered(user: Entity, interference: Entity, sattelite: Entity, cosine=None):
+    """
+    Determines if the interference is too close to the sattelite, as seen by the user
+    (same result as isExternalInterference)
+
+    Arguments:
+        user (Entity) -- user object for the user in question
+        interference (Entity) - interference object for the interference in question
+        sattelite (Entity) - sattelite object for the sattelite in question
+        cosine (float) -- cosine of the sattelite-user-interferer angle, if already computed
+            (default is None, to compute it from the unit vectors)
+
+    Returns:
+        (boolean) -- True if there is an interference, False if there is not
+    """
+    if cosine is None:
+        cosine = dot(direction(user, sattelite), direction(user, interference))
+
+    if cosine > cosExternalInterference + cosineGuardBand:
+        return True
+    elif cosine < cosExternalInterference - cosineGuardBand:
+        return False
+
+    return isExternalInterference(user, interference, sattelite)
+
+def beamsConflict(sattelite: Entity, userA: Entity, userB: Entity, cosine=None):
+    """
+    Determines if beams of the same color from the sattelite to the two users would
+    interfere (same result as comparing calculateAngle against starlinkInterferenceAngle)
+
+    Arguments:
+        sattelite (Entity) -- sattelite object making both beams
+        userA (Entity) -- user object of the first beam
+        userB (Entity) -- user object of the second beam
+        cosine (float) -- cosine of the userA-sattelite-userB angle, if already computed
+            (default is None, to compute it from the unit vectors)
+
+    Returns:
+        (boolean) -- True if the beams interfere, False if they do not
+    """
+    if cosine is None:
+        cosine = dot(direction(sattelite, userA), direction(sattelite, userB))
+
+    if cosine > cosStarlinkInterference + cosineGuardBand:
+        return True
+    elif cosine < cosStarlinkInterference - cosineGuardBand:
+        return False
+
+    return calculateAngle(sattelite, userA, userB) < starlinkInterferenceAngle
@@ -9,36 +9,77 @@ __author__ = "Robert Dekovich"
 __email__ = "dekovich@umich.edu"
 __status__ = "Development"
 
+import numpy as np
+from array import array
+from os.path import basename
+from collections import namedtuple
+
 from beamplan.classes.Entity import Entity
 from beamplan.classes.User import User
 from beamplan.classes.Sattelite import Sattelite
 from beamplan.classes.Interference import Interference
+from beamplan.classes.EntityTable import EntityTable
 
-def parseLineIntoClass(line, num, type):
+"""The parsed columns of one kind of entity: an array of IDs, and an (N, 3) array of positions"""
+Columns = namedtuple("Columns", ["ids", "positions"])
+
+"""The kinds of entity in an input file"""
+kinds = ("user", "sattelite", "interference")
+
+def classifyLine(line):
     """
-    Parses a line of input into a respective class object, returns the class object.
+    Classifies a line of input into the kind of entity it describes.
+
+    Arguments:
+        line {string} -- line of the input file to classify
+
+    Returns:
+        {"user", "sattelite", "interference", None} -- the kind of entity, None if the line
+            is a comment, blank, an epoch marker, or not an entity
+    """
+    # If the line was a comment, pass over (skip)
+    if '#' in line:
+        return None
+    elif line.strip() == '':
+        return None
+    elif isEpochMarker(line):
+        return None
+    elif "user" in line:
+        return "user"
+    elif "sat" in line:
+        return "sattelite"
+    elif "interferer" in line:
+        return "interference"
+    else:
+        return None
+
+def parseLine(line, num):
+    """
+    Parses a line of input into its ID and coordinates.
 
     Arguments:
         line {string} -- line of the input file to parse into information
         num {int} -- line number of the line provided (debugging purposes)
-        type {"user", "sattelite", "interference"} -- type of class to load into
-    
+
     Raises:
+        ValueError -- too few fields provided
         ValueError -- bad ID provided (cannot convert)
         ValueError -- bad x-coordinate, y-coordinate or z-coordinate (cannot convert)
-    
+
     Returns:
-        {User, Sattelite, Interference} - child class of Entity of the object parsed
+        {tuple} -- the (id, x, y, z) of the line
     """
     id = None
     x = None
     y = None
     z = None
-    outputClass = None
 
     # Split the line by whitespace
     info = line.split()
 
+    if len(info) < 5:
+        raise ValueError("Line {} has too few fields to be parsed.".format(num))
+
     try:
         # Acquire the ID provided in the input line
         id = int(info[1])
@@ -62,6 +103,29 @@ def parseLineIntoClass(line, num, type):
         z = float(info[4])
     except ValueError:
         raise ValueError("Z-coordinate provided for line {} could not be converted to float.".format(num))
+
+    return id, x, y, z
+
+def parseLineIntoClass(line, num, type):
+    """
+    Parses a line of input into a respective class object, returns the class object.
+
+    Arguments:
+        line {string} -- line of the input file to parse into information
+        num {int} -- line number of the line provided (debugging purposes)
+        type {"user", "sattelite", "interference"} -- type of class to load into
+    
+    Raises:
+        ValueError -- bad ID provided (cannot convert)
+        ValueError -- bad x-coordinate, y-coordinate or z-coordinate (cannot convert)
+    
+    Returns:
+        {User, Sattelite, Interference} - child class of Entity of the object parsed
+    """
+    outputClass = None
+
+    # Parse the ID and coordinates of the line
+    id, x, y, z = parseLine(line, num)
     
     # Create the proper output class for the line
     if type == "user":
@@ -77,6 +141,204 @@ def parseLineIntoClass(line, num, type):
     return outputClass
 
 
+def uniqueColumns(ids, positions):
+    """
+    Resolves repeated IDs in parsed columns the way a mapping of ID to entity would.
+
+    A repeated ID keeps the place of its first line, and the position of its last line.
+
+    Arguments:
+        ids {numpy.ndarray} -- (N,) array of IDs, in line order
+        positions {numpy.ndarray} -- (N, 3) array of positions, in line order
+
+    Returns:
+        {Columns} -- the columns with each ID exactly once
+    """
+    order = np.argsort(ids, kind="stable")
+    starts = np.flatnonzero(np.diff(ids[order], prepend=ids[order][:1] - 1))
+
+    # Every ID is unique, the columns are already resolved
+    if len(starts) == len(ids):
+        return Columns(ids, positions)
+
+    # The first and last line of each ID
+    firsts = order[starts]
+    lasts = order[np.append(starts[1:], len(ids)) - 1]
+    keep = np.argsort(firsts, kind="stable")
+
+    return Columns(ids[firsts[keep]], positions[lasts[keep]])
+
+def isEpochMarker(line):
+    """
+    Determines if a line of input marks the start of an epoch (e.g. "epoch 12").
+
+    Arguments:
+        line {string} -- line of the input file to check
+
+    Returns:
+        {bool} -- True if the first word of the line is "epoch"
+    """
+    return line.split(None, 1)[:1] == ["epoch"]
+
+def emptyColumns():
+    """
+    Returns the typed, growable arrays the IDs and coordinates of each kind of entity are parsed into.
+    """
+    return {kind: array('q') for kind in kinds}, {kind: array('d') for kind in kinds}
+
+def appendLine(ids, coordinates, line, num):
+    """
+    Parses a line of input, and appends it to the arrays of its kind (if it is an entity).
+
+    Arguments:
+        ids {dict} -- mapping of each kind of entity to its array of IDs
+        coordinates {dict} -- mapping of each kind of entity to its array of coordinates
+        line {string} -- line of the input file to parse
+        num {int} -- line number of the line provided (debugging purposes)
+    """
+    kind = classifyLine(line)
+
+    # Skip comments, blank lines and anything that is not an entity
+    if kind is None:
+        return
+
+    # Parse the line, and append it to the columns of its kind
+    id, x, y, z = parseLine(line, num)
+    ids[kind].append(id)
+    coordinates[kind].extend((x, y, z))
+
+def finishColumns(ids, coordinates):
+    """
+    Returns the Columns of each kind of entity, from the arrays they were parsed into.
+
+    Arguments:
+        ids {dict} -- mapping of each kind of entity to its array of IDs
+        coordinates {dict} -- mapping of each kind of entity to its array of coordinates
+    """
+    return {kind: uniqueColumns(np.frombuffer(ids[kind], dtype=np.int64),
+                                np.frombuffer(coordinates[kind], dtype=np.float64).reshape(-1, 3))
+            for kind in kinds}
+
+def parseColumns(infile):
+    """
+    Parses the input file, line by line, into columns of IDs and positions per kind of entity.
+
+    The file is streamed rather than read whole, and each line's ID and coordinates are
+    appended to typed, growable arrays of its kind, so no per-entity objects are made.
+    Lines are classified exactly as by parseInfile.
+
+    Arguments:
+        infile {string} -- absolute path of the input file to be parsed
+
+    Raises:
+        ValueError -- a line could not be parsed (see parseLine)
+
+    Returns:
+        {dict} -- mapping of each kind of entity ("user", "sattelite", "interference") to its Columns
+    """
+    with open(infile, 'r') as f:
+        return parseLines(f)
+
+def parseLines(lines):
+    """
+    Parses lines of input into columns of IDs and positions per kind of entity (see parseColumns).
+
+    Arguments:
+        lines {iterable} -- the lines of a scenario, e.g. an open file, or a string's splitlines()
+
+    Raises:
+        ValueError -- a line could not be parsed (see parseLine)
+
+    Returns:
+        {dict} -- mapping of each kind of entity ("user", "sattelite", "interference") to its Columns
+    """
+    ids, coordinates = emptyColumns()
+
+    # For each line (read incrementally)
+    for num, line in enumerate(lines):
+        appendLine(ids, coordinates, line, num)
+
+    return finishColumns(ids, coordinates)
+
+def parseEpochs(infile):
+    """
+    Parses the input file into one set of columns per epoch, yielding each as it is read.
+
+    A line starting with the word "epoch" (e.g. "epoch 12") starts a new epoch, labelled
+    by the rest of the line.  Entities before the first marker make up an epoch of their
+    own, labelled by the name of the file, so a file without markers is a single epoch.
+
+    Arguments:
+        infile {string} -- absolute path of the input file to be parsed
+
+    Raises:
+        ValueError -- a line could not be parsed (see parseLine)
+
+    Yields:
+        {tuple} -- (label, columns), the label of the epoch and its mapping of each kind of
+            entity to its Columns (see parseColumns)
+    """
+    label, marked = basename(infile), False
+    ids, coordinates = emptyColumns()
+
+    with open(infile, 'r') as f:
+        for num, line in enumerate(f):
+            if not isEpochMarker(line):
+                appendLine(ids, coordinates, line, num)
+                continue
+
+            # Finish the current epoch (unless it is an empty lead-in before the first marker)
+            if marked or any(len(ids[kind]) for kind in kinds):
+                yield label, finishColumns(ids, coordinates)
+
+            # Label the next epoch by the rest of the marker (or its line number, if there is none)
+            words = line.split(None, 1)
+            label = words[1].strip() if len(words) > 1 else str(num)
+            marked = True
+            ids, coordinates = emptyColumns()
+
+    if marked or any(len(ids[kind]) for kind in kinds):
+        yield label, finishColumns(ids, coordinates)
+
+def buildTables(columns):
+    """
+    Builds the compact stores of entities from parsed columns.
+
+    Users and interferers only ever need their positions, so they are kept as EntityTables
+    (read-only mappings of ID to entity object).  Sattelites carry the state of their beams,
+    so each is a Sattelite object.
+
+    Arguments:
+        columns {dict} -- mapping of each kind of entity to its Columns (see parseColumns)
+
+    Returns:
+        {tuple} -- (users, sattelites, interferences), where users and interferences are
+            EntityTables of User and Interference, and sattelites maps ID to Sattelite object
+    """
+    users = EntityTable.fromColumns(User, columns["user"])
+    interferences = EntityTable.fromColumns(Interference, columns["interference"])
+    sattelites = {id: Sattelite(id, x, y, z) for id, (x, y, z)
+                  in zip(columns["sattelite"].ids.tolist(), columns["sattelite"].positions.tolist())}
+
+    return users, sattelites, interferences
+
+def buildEntities(columns):
+    """
+    Builds the mappings of ID to entity object from parsed columns.
+
+    Arguments:
+        columns {dict} -- mapping of each kind of entity to its Columns (see parseColumns)
+
+    Returns:
+        {tuple} -- (users, sattelites, interferences) mappings of ID to User, Sattelite and
+            Interference objects, in the order of the columns
+    """
+    classes = {"user": User, "sattelite": Sattelite, "interference": Interference}
+
+    return tuple({id: classes[kind](id, x, y, z)
+                  for id, (x, y, z) in zip(columns[kind].ids.tolist(), columns[kind].positions.tolist())}
+                 for kind in kinds)
+
 def parseInfile(infile):
     """
     Parses the input file into it's respective divisions and classes, returns mapping.
@@ -96,44 +358,13 @@ def parseInfile(infile):
         infile {string} -- absolute path of the input file to be parsed
     
     Returns:
-        TODO
+        {tuple} -- (users, sattelites, interferences) mappings of ID to User, Sattelite and
+            Interference objects
     """
-    users = {}
-    sattelites = {}
-    interferences = {}
-
     try:
-        with open(infile, 'r') as f:
-            # For each line in the file
-            for num, line in enumerate(f.readlines()):
-                # If the line was a comment, pass over (skip)
-                if '#' in line:
-                    continue
-                elif line.strip() == '':
-                    continue
-                elif "user" in line:
-                    # Parse the line, populate a User class
-                    user = parseLineIntoClass(line, num, "user")
-
-                    # Add it to the user mapping
-                    users[user.getID()] = user
-                elif "sat" in line:
-                    # Parse the line, populate a Sattelite class
-                    sattelite = parseLineIntoClass(line, num, "sattelite")
-
-                    # Add it to the sattelite mapping
-                    sattelites[sattelite.getID()] = sattelite
-                elif "interferer" in line:
-                    # Parse the line, populate an Interference class
-                    interference = parseLineIntoClass(line, num, "interference")
-
-                    # Add it to the interference mapping
-                    interferences[interference.getID()] = interference
-                else:
-                    continue
-        
+        columns = parseColumns(infile)
     except ValueError as e:
         print(e)
         exit()
 
-    return users, sattelites, interferences
\ No newline at end of file
+    return buildEntities(columns)
@@ -0,0 +1,186 @@
+"""
+Module containing the profiling functionality for the beamplan package.
+
+The phases of a run are marked with phase(name), which does nothing but return
+a shared empty context while profiling is disabled.  The counters live in
+counting wrappers of the functions doing the work (the exact angle measurement,
+the visibility and interference batches, the color checks of the sattelites, and
+the conflict graphs and colorings of the coloring solver), which are only swapped
+in while a profile is being recorded, so a run that is not profiled executes
+exactly the code it always has.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import sys
+from contextlib import nullcontext
+
+from beamplan.classes.Profile import Profile
+from beamplan.classes.Sattelite import Sattelite
+from beamplan.classes.InterfererIndex import InterfererIndex
+from beamplan.modules import measurement, visibility
+
+"""The Profile being recorded (None while profiling is disabled)"""
+activeProfile = None
+
+"""The context returned by phase while profiling is disabled"""
+nullPhase = nullcontext()
+
+"""The counters kept by the counting wrappers (reported even when nothing was counted)"""
+counterNames = ("exactAngles", "visibilityPairs", "interferenceChecks", "conflictPairs")
+
+"""The functions replaced by counting wrappers while profiling, as (owner, name, original)"""
+wrapped = []
+
+def phase(name):
+    """
+    Returns the context timing a phase of the run (an empty one while profiling is disabled).
+
+    Arguments:
+        name {str} -- the name of the phase
+    """
+    if activeProfile is None:
+        return nullPhase
+
+    return activeProfile.phase(name)
+
+def peakRSS():
+    """
+    Returns the peak resident memory of the process so far, in bytes (None where it is unknown).
+
+    The resource module is POSIX-only, so it is imported here rather than with the module,
+    and a platform without it (e.g. Windows) reports no peak memory.
+    """
+    try:
+        from resource import getrusage, RUSAGE_SELF
+    except ImportError:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+    return getrusage(RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+def wrap(owner, name, wrapper):
+    """
+    Replaces a function with a wrapper of it, remembering the original.
+
+    Arguments:
+        owner {object} -- the module or class holding the function
+        name {str} -- the name of the function
+        wrapper {func} -- function taking the original, returning its replacement
+    """
+    original = getattr(owner, name)
+    wrapped.append((owner, name, original))
+    setattr(owner, name, wrapper(original))
+
+def countingAngle(original):
+    """
+    Wraps calculateAngle, counting the angles measured exactly
+    """
+    def calculateAngle(v, a, b):
+        activeProfile.count("exactAngles")
+        return original(v, a, b)
+    return calculateAngle
+
+def countingVisibility(original):
+    """
+    Wraps visibilityMatrix, counting the user-sattelite pairs measured
+    """
+    def visibilityMatrix(userPositions, sattelitePositions):
+        activeProfile.count("visibilityPairs", len(userPositions) * len(sattelitePositions))
+        return original(userPositions, sattelitePositions)
+    return visibilityMatrix
+
+def countingInterference(original):
+    """
+    Wraps InterfererIndex.blockedMask, counting the users checked against the interferers
+    """
+    def blockedMask(self, userRows, sattelitePosition):
+        activeProfile.count("interferenceChecks", len(userRows))
+        return original(self, userRows, sattelitePosition)
+    return blockedMask
+
+def countingColors(original):
+    """
+    Wraps Sattelite.colorConflicts, counting the candidates checked and rejected per color
+    """
+    def colorConflicts(self, userID, direction, color, getUser):
+        rejected = original(self, userID, direction, color, getUser)
+        activeProfile.countColor(self.id, color, rejected)
+        return rejected
+    return colorConflicts
+
+def countingConflicts(original):
+    """
+    Wraps conflictMatrix (as the sattelites call it), counting the pairs of beams measured
+    """
+    def conflictMatrix(sattelite, directionsA, userIDsA, directionsB, userIDsB, getUser):
+        activeProfile.count("conflictPairs", len(directionsA) * len(directionsB))
+        return original(sattelite, directionsA, userIDsA, directionsB, userIDsB, getUser)
+    return conflictMatrix
+
+def countingCandidates(original):
+    """
+    Wraps Sattelite.colorFactory, counting the candidates each sattelite examined and rejected
+    """
+    def colorFactory(self, existingBeams, users, candidates=None):
+        beams, rejected = len(self.getBeams()), len(self.getRejectedUsers())
+        result = original(self, existingBeams, users, candidates)
+        beams, rejected = len(self.getBeams()) - beams, len(self.getRejectedUsers()) - rejected
+        if beams or rejected:
+            activeProfile.countCandidates(self.id, beams + rejected, rejected)
+        return result
+    return colorFactory
+
+def startProfiling(profile=None):
+    """
+    Starts recording a profile, swapping in the counting wrappers.
+
+    The counters of sattelites solved in other processes (workers > 1) are not recorded.
+
+    Arguments:
+        profile {Profile} -- the profile to record into (None for a new one)
+
+    Raises:
+        RuntimeError -- a profile is already being recorded
+
+    Returns:
+        {Profile} -- the profile being recorded
+    """
+    global activeProfile
+
+    if activeProfile is not None:
+        raise RuntimeError("A profile is already being recorded.")
+
+    activeProfile = Profile() if profile is None else profile
+    for name in counterNames:
+        activeProfile.counters.setdefault(name, 0)
+
+    wrap(measurement, "calculateAngle", countingAngle)
+    wrap(visibility, "visibilityMatrix", countingVisibility)
+    wrap(InterfererIndex, "blockedMask", countingInterference)
+    wrap(Sattelite, "colorConflicts", countingColors)
+    wrap(sys.modules[Sattelite.__module__], "conflictMatrix", countingConflicts)
+    wrap(Sattelite, "colorFactory", countingCandidates)
+
+    return activeProfile
+
+def stopProfiling():
+    """
+    Stops recording the profile, restoring the original functions.
+
+    Returns:
+        {Profile} -- the profile recorded (None if none was being recorded)
+    """
+    global activeProfile
+
+    while wrapped:
+        owner, name, original = wrapped.pop()
+        setattr(owner, name, original)
+
+    profile, activeProfile = activeProfile, None
+    return profile
@@ -0,0 +1,173 @@
+"""
+Module containing the vectorized orbital propagation functionality for the beamplan package.
+
+A constellation is described as shells of circular orbits (e.g. the 18 planes
+of 20 sattelites at a 53 degree inclination behind 07_eighteen_planes), rather
+than as the positions of every sattelite.  The positions of every sattelite at
+every epoch are computed at once in arrays, rotated with the Earth into ECEF,
+and handed to the planner as columns, without writing scenario files.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from collections import namedtuple
+
+from beamplan.modules.parse import Columns
+
+"""The mean radius of the Earth, in kilometers (the sattelite altitudes are measured from it)"""
+earthRadius = 6371.0
+
+"""The gravitational parameter of the Earth, in cubic kilometers per second squared"""
+earthMu = 398600.4418
+
+"""The rotation rate of the Earth (sidereal), in radians per second"""
+earthRotationRate = 7.2921159e-5
+
+"""
+A shell of circular orbits in a Walker delta pattern: the altitude (kilometers), the
+inclination (degrees), the number of planes, the number of sattelites per plane, the
+phasing factor (the phase offset between adjacent planes, in units of 360 / total
+sattelites), and the right ascension of the first plane (degrees).
+"""
+Shell = namedtuple("Shell", ["altitude", "inclination", "planes", "sattelitesPerPlane", "phasing", "raan"],
+                   defaults=(0, 0.0))
+
+def parseConstellation(infile):
+    """
+    Parses a constellation description file into its shells.
+
+    Each line "shell ALTITUDE INCLINATION PLANES PER_PLANE [PHASING [RAAN]]" describes one
+    shell, e.g. "shell 550 53 18 20".  Comments and blank lines are skipped.
+
+    Arguments:
+        infile {string} -- absolute path of the constellation file to be parsed
+
+    Raises:
+        ValueError -- a line could not be parsed
+
+    Returns:
+        {list} -- the Shells of the constellation, in order
+    """
+    shells = []
+
+    with open(infile, 'r') as f:
+        for num, line in enumerate(f):
+            words = line.split('#', 1)[0].split()
+
+            # Skip comments, blank lines and anything that is not a shell
+            if not words or words[0] != "shell":
+                continue
+
+            if not 5 <= len(words) <= 7:
+                raise ValueError("Line {} is not a shell of the form: shell ALTITUDE INCLINATION PLANES PER_PLANE [PHASING [RAAN]].".format(num))
+
+            try:
+                altitude, inclination = float(words[1]), float(words[2])
+                planes, perPlane = int(words[3]), int(words[4])
+                phasing = int(words[5]) if len(words) > 5 else 0
+                raan = float(words[6]) if len(words) > 6 else 0.0
+            except ValueError:
+                raise ValueError("Shell provided for line {} could not be converted to numbers.".format(num))
+
+            if planes < 1 or perPlane < 1:
+                raise ValueError("Shell provided for line {} must have at least one plane and sattelite.".format(num))
+
+            shells.append(Shell(altitude, inclination, planes, perPlane, phasing, raan))
+
+    return shells
+
+def shellElements(shells):
+    """
+    Returns the orbital elements of every sattelite of the shells, in order (plane by plane).
+
+    Arguments:
+        shells {list} -- the Shells of the constellation
+
+    Returns:
+        {tuple} -- (radius, inclination, raan, phase, motion) arrays with one entry per sattelite:
+            the orbital radius (kilometers), the inclination, the right ascension of the ascending
+            node and the argument of latitude at time zero (radians), and the mean motion (radians
+            per second)
+    """
+    elements = []
+
+    for shell in shells:
+        total = shell.planes * shell.sattelitesPerPlane
+        plane, slot = np.divmod(np.arange(total), shell.sattelitesPerPlane)
+        radius = earthRadius + shell.altitude
+
+        # Planes are spread evenly in right ascension, sattelites evenly along their plane
+        raan = np.radians(shell.raan) + (2 * np.pi * plane / shell.planes)
+        phase = (2 * np.pi * slot / shell.sattelitesPerPlane) + (2 * np.pi * shell.phasing * plane / total)
+
+        elements.append((np.full(total, radius), np.full(total, np.radians(shell.inclination)),
+                         raan, phase, np.full(total, np.sqrt(earthMu / radius ** 3))))
+
+    if not elements:
+        return tuple(np.empty(0) for _ in range(5))
+
+    return tuple(np.concatenate(arrays) for arrays in zip(*elements))
+
+def propagate(shells, times):
+    """
+    Computes the ECEF positions of every sattelite of the shells at every time.
+
+    Each orbit is circular, so the argument of latitude grows linearly with time.  The
+    position in the inertial frame is rotated about the z axis by the angle the Earth
+    has turned since time zero, at which the two frames are aligned.
+
+    Arguments:
+        shells {list} -- the Shells of the constellation
+        times {numpy.ndarray} -- (T,) array of the times, in seconds from time zero
+
+    Returns:
+        {numpy.ndarray} -- (T, S, 3) array of the x, y and z coordinates of each sattelite at each time
+    """
+    radius, inclination, raan, phase, motion = shellElements(shells)
+    times = np.asarray(times, dtype=np.float64).reshape(-1)
+
+    # Argument of latitude of every sattelite at every time, and the node in the Earth-fixed frame
+    latitude = phase[None, :] + (motion[None, :] * times[:, None])
+    node = raan[None, :] - (earthRotationRate * times[:, None])
+
+    cosLatitude, sinLatitude = np.cos(latitude), np.sin(latitude)
+    cosNode, sinNode = np.cos(node), np.sin(node)
+    cosInclination, sinInclination = np.cos(inclination), np.sin(inclination)
+
+    positions = np.empty(latitude.shape + (3,))
+    positions[..., 0] = radius * ((cosLatitude * cosNode) - (sinLatitude * cosInclination * sinNode))
+    positions[..., 1] = radius * ((cosLatitude * sinNode) + (sinLatitude * cosInclination * cosNode))
+    positions[..., 2] = radius * (sinLatitude * sinInclination)
+
+    return positions
+
+def propagatedEpochs(columns, shells, times, firstID=1):
+    """
+    Yields one epoch per time, with the sattelites of the scenario replaced by the propagated shells.
+
+    The users and interferers of the scenario are kept as they are (both are fixed in ECEF),
+    and the sattelites are numbered from firstID, in the order of the shells.  The positions
+    of all the epochs are computed at once.
+
+    Arguments:
+        columns {dict} -- mapping of each kind of entity to its Columns (see parse.parseColumns)
+        shells {list} -- the Shells of the constellation
+        times {numpy.ndarray} -- (T,) array of the times of the epochs, in seconds from time zero
+        firstID {int} -- the ID of the first sattelite
+
+    Yields:
+        {tuple} -- (label, columns), the time of the epoch and its columns (see parse.parseEpochs)
+    """
+    positions = propagate(shells, times)
+    ids = np.arange(firstID, firstID + positions.shape[1], dtype=np.int64)
+
+    for time, epochPositions in zip(np.asarray(times).reshape(-1).tolist(), positions):
+        epoch = dict(columns)
+        epoch["sattelite"] = Columns(ids, epochPositions)
+        yield "t={:g}s".format(time), epoch
@@ -0,0 +1,99 @@
+"""
+Module containing the rejection accounting functionality for the beamplan package.
+
+Every unserved user is given the reason it lost out, as one byte per user: no
+sattelite is visible to it, every visible sattelite is blocked by an interferer,
+a sattelite examined it but every color conflicted, or the sattelites it was
+viable to filled up before reaching it.  The reasons come from what the planning
+already computed (the visible and viable users of computeViability, and the
+candidates beamFactory rejected), rather than from a second pass.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+
+"""The names of the reasons, indexed by their code (the first is a served user, not a rejection)"""
+reasonNames = ("served", "noVisibleSattelite", "interfererBlocked", "capacityExhausted", "colorConflict")
+
+"""The codes of the reasons"""
+served, noVisibleSattelite, interfererBlocked, capacityExhausted, colorConflict = range(len(reasonNames))
+
+def reachability(numUsers, visibleRows, viableRows):
+    """
+    Returns how far each user got through the viability checks.
+
+    Arguments:
+        numUsers {int} -- the number of users
+        visibleRows {list} -- for each sattelite, the rows of the users it is visible to
+        viableRows {list} -- for each sattelite, the rows of the users it is viable to
+
+    Returns:
+        {numpy.ndarray} -- (U,) uint8 array of noVisibleSattelite, interfererBlocked, or
+            capacityExhausted (for a user viable to some sattelite, until it is served or rejected)
+    """
+    def reached(rows):
+        # Whether each user is in any of the lists of rows
+        mask = np.zeros(numUsers, dtype=bool)
+        for sattelite in rows:
+            mask[sattelite] = True
+        return mask
+
+    reach = np.full(numUsers, capacityExhausted, dtype=np.uint8)
+    reach[~reached(viableRows)] = interfererBlocked
+    reach[~reached(visibleRows)] = noVisibleSattelite
+
+    return reach
+
+def rejectionReasons(plan):
+    """
+    Returns the reason each user of the plan is unserved (or that it is served).
+
+    A user viable to some sattelite is a color conflict if any sattelite examined it and
+    rejected it on every color, and otherwise lost out to the capacity of its sattelites.
+
+    Arguments:
+        plan {Plan} -- the solved plan
+
+    Raises:
+        ValueError -- the plan has changed since its viability was computed (see replan)
+
+    Returns:
+        {numpy.ndarray} -- (U,) uint8 array of the code of each user's reason, by user row
+    """
+    if plan.reachability is None or len(plan.reachability) != len(plan.users):
+        raise ValueError("The rejection reasons are only recorded from a full computeViability.")
+
+    reasons = plan.reachability.copy()
+
+    # Users a sattelite examined and rejected on every color
+    rejected = [np.frombuffer(sattelite.getRejectedUsers(), dtype=np.int64) for sattelite in plan.sattelites.values()]
+    rejected = np.unique(np.concatenate(rejected)) if rejected else np.zeros(0, dtype=np.int64)
+    if len(rejected):
+        rows = plan.users.rows(rejected)
+        reasons[rows[reasons[rows] == capacityExhausted]] = colorConflict
+
+    # Users served, whatever happened to them along the way
+    if plan.existing:
+        reasons[plan.users.rows(list(plan.existing))] = served
+
+    return reasons
+
+def rejectionHistogram(reasons):
+    """
+    Returns the number of users of each reason.
+
+    Arguments:
+        reasons {numpy.ndarray} -- the code of each user's reason (see rejectionReasons)
+
+    Returns:
+        {dict} -- mapping of the name of each reason to its number of users
+    """
+    counts = np.bincount(reasons, minlength=len(reasonNames))
+
+    return {name: int(count) for name, count in zip(reasonNames, counts)}
@@ -0,0 +1,414 @@
+"""
+Module containing the incremental re-planning functionality for the beamplan package.
+
+Between planning cycles only a few users join or leave, a few sattelites drift,
+and the odd interferer appears.  Rather than planning the whole scenario again,
+a solved Plan is updated with a Delta: only the visibility and interference of
+the changed entities are measured, and only the beams of the sattelites the
+change reaches are rebuilt.  The update returns the beams added and removed.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from collections import namedtuple
+
+from beamplan import beamsPerSattelite
+from beamplan.classes.InterfererIndex import InterfererIndex
+from beamplan.modules.visibility import visibleUsersBySattelite
+from beamplan.modules.interference import interferenceMask
+from beamplan.modules.parse import Columns
+
+"""
+The change between two planning cycles.  Added users, moved sattelites and added
+interferers are Columns of IDs and positions (see parse.Columns), removed users an
+iterable of IDs.  Any of them may be None when nothing of the kind changed.
+"""
+Delta = namedtuple("Delta", ["addedUsers", "removedUsers", "movedSattelites", "addedInterferences"],
+                   defaults=(None, None, None, None))
+
+"""The beams an update added and removed (a beam whose ID, user or color changed is in both)"""
+BeamDiff = namedtuple("BeamDiff", ["added", "removed"])
+
+def tableDelta(ids, positions, columns):
+    """
+    Compares the entities of a table against new columns of the same kind.
+
+    Arguments:
+        ids {numpy.ndarray} -- (N,) array of the current IDs
+        positions {numpy.ndarray} -- (N, 3) array of the current positions
+        columns {Columns} -- the new IDs and positions
+
+    Returns:
+        {tuple} -- (added, removed, moved) arrays, the indices (into columns) of the new IDs,
+            the current IDs that are gone, and the indices (into columns) of the IDs whose
+            position changed
+    """
+    newIDs = np.asarray(columns.ids, dtype=np.int64)
+    order = np.argsort(ids, kind="stable")
+
+    # Look each new ID up among the current ones
+    found = np.searchsorted(ids[order], newIDs).clip(0, max(len(ids) - 1, 0))
+    present = ids[order][found] == newIDs if len(ids) else np.zeros(len(newIDs), dtype=bool)
+    rows = order[found[present]]
+
+    moved = np.flatnonzero(present)[np.any(positions[rows] != np.asarray(columns.positions)[present], axis=1)]
+
+    return np.flatnonzero(~present), ids[~np.isin(ids, newIDs)], moved
+
+def scenarioDelta(plan, columns):
+    """
+    Determines the Delta that turns the scenario of a plan into the scenario of new columns.
+
+    A user that moved is removed and added again.  Sattelites joining or leaving the
+    constellation, and interferers leaving or moving, cannot be expressed as a Delta.
+
+    Arguments:
+        plan {Plan} -- the current plan
+        columns {dict} -- mapping of each kind of entity to its new Columns (see parse.parseColumns)
+
+    Returns:
+        {Delta} -- the change between the scenarios, None if it cannot be expressed as a Delta
+    """
+    satteliteIDs = np.array(list(plan.sattelites), dtype=np.int64)
+    added, removed, moved = tableDelta(satteliteIDs, plan.sattelitePositions(), columns["sattelite"])
+    if len(added) or len(removed):
+        return None
+    sattelites = columns["sattelite"]
+    movedSattelites = Columns(sattelites.ids[moved], sattelites.positions[moved])
+
+    added, removed, moved = tableDelta(plan.interferences.ids, plan.interferences.positions, columns["interference"])
+    if len(removed) or len(moved):
+        return None
+    interferences = columns["interference"]
+    addedInterferences = Columns(interferences.ids[added], interferences.positions[added])
+
+    added, removed, moved = tableDelta(plan.users.ids, plan.users.positions, columns["user"])
+    users = columns["user"]
+    added = np.sort(np.concatenate((added, moved)))
+    addedUsers = Columns(users.ids[added], users.positions[added])
+    removedUsers = np.concatenate((removed, users.ids[moved]))
+
+    return Delta(addedUsers, removedUsers, movedSattelites, addedInterferences)
+
+def viableArray(sattelite):
+    """
+    Returns the viable users of the sattelite as an array of IDs (a view, not a copy).
+
+    Arguments:
+        sattelite {Sattelite} -- the sattelite to read
+    """
+    return np.frombuffer(sattelite.getViableUsers(), dtype=np.int64)
+
+def releaseBeams(plan, sattelite, userIDs, touch):
+    """
+    Removes the beams of the sattelite serving any of the users, and marks the users as unserved.
+
+    Arguments:
+        plan {Plan} -- the plan being updated
+        sattelite {Sattelite} -- the sattelite whose beams are removed
+        userIDs {set} -- IDs of the users to release
+        touch (func) -- function recording the beams of a sattelite before it first changes
+
+    Returns:
+        {list} -- IDs of the users released
+    """
+    touch(sattelite)
+    released = [beam.getUserID() for beam in sattelite.removeBeams(userIDs)]
+
+    for userID in released:
+        plan.existing.pop(userID, None)
+
+    return released
+
+def moveSattelites(plan, moved, touch):
+    """
+    Moves sattelites, measures their viable users again, and re-colors their beams.
+
+    The users served before the move are tried first, in their previous order, so
+    the beams that are still valid are kept where the geometry allows.
+
+    Arguments:
+        plan {Plan} -- the plan being updated
+        moved {Columns} -- IDs and new positions of the moved sattelites
+        touch (func) -- function recording the beams of a sattelite before it first changes
+
+    Returns:
+        {list} -- IDs of the users released by the moved sattelites
+    """
+    sattelites = [plan.sattelites[id] for id in moved.ids.tolist()]
+    positions = np.asarray(moved.positions, dtype=np.float64).reshape(-1, 3)
+    released = []
+
+    # Only these sattelites are measured against the users
+    visible = visibleUsersBySattelite(plan.users.positions, positions)
+
+    for rows, position, sattelite in zip(visible, positions, sattelites):
+        touch(sattelite)
+        sattelite.setPosition(*position.tolist())
+
+        # The index of the plan is reused while the users and interferers are unchanged
+        if plan.interfererIndex is not None:
+            clear = ~plan.interfererIndex.blockedMask(rows, position)
+        else:
+            clear = interferenceMask(plan.users.positions[rows], position, plan.interferences.positions)
+
+        sattelite.setViableUsers(plan.users.ids[rows[clear]].tolist())
+
+        # Release every beam (the angles between its users changed), then re-serve the still viable first
+        previous = [beam.getUserID() for beam in sattelite.getBeams()]
+        for userID in previous:
+            plan.existing.pop(userID, None)
+        sattelite.clearBeams()
+
+        viable = set(viableArray(sattelite).tolist())
+        sattelite.beamFactory(plan.existing, plan.users.__getitem__, [id for id in previous if id in viable])
+        released.extend(id for id in previous if id not in plan.existing)
+
+    return released
+
+def removeUsers(plan, removedIDs, touch):
+    """
+    Removes users from the plan, from the viable users of the sattelites, and from their beams.
+
+    Arguments:
+        plan {Plan} -- the plan being updated
+        removedIDs {numpy.ndarray} -- IDs of the users to remove
+        touch (func) -- function recording the beams of a sattelite before it first changes
+
+    Raises:
+        KeyError -- a user is not in the plan
+
+    Returns:
+        {set} -- IDs of the sattelites that lost a beam
+    """
+    positions = plan.users.positions[plan.users.rows(removedIDs)]
+    sattelites = list(plan.sattelites.values())
+
+    # A removed user can only be viable to the sattelites visible to it
+    visible = visibleUsersBySattelite(positions, plan.sattelitePositions())
+
+    for rows, sattelite in zip(visible, sattelites):
+        if len(rows):
+            sattelite.filterViableUsers(~np.isin(viableArray(sattelite), removedIDs[rows]))
+
+    # Release the beams serving the removed users, grouped by sattelite
+    serving = {}
+    for userID in removedIDs.tolist():
+        if userID in plan.existing:
+            serving.setdefault(plan.existing[userID], set()).add(userID)
+
+    for satteliteID, userIDs in serving.items():
+        releaseBeams(plan, plan.sattelites[satteliteID], userIDs, touch)
+
+    plan.users = plan.users.without(removedIDs)
+    plan.interfererIndex = None
+
+    return set(serving)
+
+def addInterferences(plan, added, touch):
+    """
+    Adds interferers to the plan, and drops the viable users (and beams) they block.
+
+    Only the new interferers are measured, against the viable users of each sattelite.
+
+    Arguments:
+        plan {Plan} -- the plan being updated
+        added {Columns} -- IDs and positions of the new interferers
+        touch (func) -- function recording the beams of a sattelite before it first changes
+
+    Returns:
+        {tuple} -- (satteliteIDs, released), the IDs of the sattelites that lost a beam
+            and the IDs of the users released
+    """
+    positions = np.asarray(added.positions, dtype=np.float64).reshape(-1, 3)
+    plan.interferences = plan.interferences.extended(added.ids, positions)
+    plan.interfererIndex = None
+
+    changed, released = set(), []
+
+    for sattelite in plan.sattelites.values():
+        viable = viableArray(sattelite)
+        if len(viable) == 0:
+            continue
+
+        rows = plan.users.rows(viable)
+        clear = interferenceMask(plan.users.positions[rows], np.array(sattelite.getPosition()), positions)
+        if clear.all():
+            continue
+
+        # Release the beams of the blocked users this sattelite was serving
+        blocked = set(viable[~clear].tolist())
+        sattelite.filterViableUsers(clear)
+        served = {id for id in blocked if plan.existing.get(id) == sattelite.getID()}
+
+        if served:
+            released.extend(releaseBeams(plan, sattelite, served, touch))
+            changed.add(sattelite.getID())
+
+    return changed, released
+
+def addUsers(plan, added):
+    """
+    Adds users to the plan, and to the viable users of the sattelites they can be served by.
+
+    Only the new users are measured, against every sattelite and interferer.
+
+    Arguments:
+        plan {Plan} -- the plan being updated
+        added {Columns} -- IDs and positions of the new users
+
+    Raises:
+        ValueError -- a user is already in the plan
+
+    Returns:
+        {list} -- IDs of the new users
+    """
+    ids = np.asarray(added.ids, dtype=np.int64).reshape(-1)
+    positions = np.asarray(added.positions, dtype=np.float64).reshape(-1, 3)
+    plan.users = plan.users.extended(ids, positions)
+    plan.interfererIndex = None
+
+    sattelitePositions = plan.sattelitePositions()
+    visible = visibleUsersBySattelite(positions, sattelitePositions)
+    index = InterfererIndex(positions, plan.interferences.positions)
+
+    # The new users are the last in user order, so they are appended to the viable users
+    for column, (rows, sattelite) in enumerate(zip(visible, plan.sattelites.values())):
+        if len(rows):
+            clear = ~index.blockedMask(rows, sattelitePositions[column])
+            sattelite.getViableUsers().extend(ids[rows[clear]].tolist())
+
+    return ids.tolist()
+
+def validateDelta(plan, delta):
+    """
+    Makes sure the delta can be applied to the plan, before any of it is.
+
+    Arguments:
+        plan {Plan} -- the plan to be updated
+        delta {Delta} -- the change to apply
+
+    Raises:
+        KeyError -- a removed user or moved sattelite is not in the plan
+        ValueError -- an added user or interferer is already in the plan (or is given twice)
+    """
+    removed = set()
+    if delta.removedUsers is not None:
+        removed = set(delta.removedUsers)
+        plan.users.rows(list(removed))
+
+    if delta.movedSattelites is not None:
+        for id in delta.movedSattelites.ids.tolist():
+            if id not in plan.sattelites:
+                raise KeyError(id)
+
+    # Only the IDs are checked, the tables are left as they are (a removed user may be added back)
+    if delta.addedUsers is not None:
+        ids = [id for id in delta.addedUsers.ids.tolist() if id not in removed]
+        plan.users.extended(ids, np.empty((len(ids), 3)))
+        if len(set(delta.addedUsers.ids.tolist())) != len(delta.addedUsers.ids):
+            raise ValueError("An added user is given more than once.")
+
+    if delta.addedInterferences is not None:
+        plan.interferences.extended(delta.addedInterferences.ids, np.empty((len(delta.addedInterferences.ids), 3)))
+
+def replan(plan, delta):
+    """
+    Updates a solved plan with the change between two planning cycles.
+
+    The sattelites that moved, or that lost a beam (to a removed user or a new interferer),
+    are rebuilt over all of their viable users, keeping their remaining beams.  The users
+    left unserved by the change, and the new users, are then offered to the other sattelites
+    with room that can serve them.  Beams are made greedily (see Sattelite.beamFactory),
+    whichever solver made the plan; the other sattelites keep their beams as they are.
+
+    Arguments:
+        plan {Plan} -- the solved plan, which is updated in place
+        delta {Delta} -- the change to apply
+
+    Raises:
+        KeyError -- a removed user or moved sattelite is not in the plan
+        ValueError -- an added user or interferer is already in the plan
+
+    Returns:
+        {tuple} -- (plan, diff), the updated plan and the BeamDiff of the beams added and removed
+    """
+    validateDelta(plan, delta)
+    before = {}
+
+    # The reasons users are unserved are only recorded by a full planning (see modules.rejection)
+    plan.reachability = None
+
+    def touch(sattelite):
+        # Record the beams of the sattelite, the first time it is about to change
+        if sattelite.getID() not in before:
+            before[sattelite.getID()] = list(sattelite.getBeams())
+
+    rebuild, pool = set(), []
+
+    # Moved sattelites go first, while the interferer index of the plan still holds
+    if delta.movedSattelites is not None and len(delta.movedSattelites.ids):
+        pool.extend(moveSattelites(plan, delta.movedSattelites, touch))
+        rebuild.update(delta.movedSattelites.ids.tolist())
+
+    if delta.removedUsers is not None:
+        removedIDs = np.unique(np.asarray(list(delta.removedUsers), dtype=np.int64))
+        if len(removedIDs):
+            rebuild.update(removeUsers(plan, removedIDs, touch))
+
+    if delta.addedInterferences is not None and len(delta.addedInterferences.ids):
+        changed, released = addInterferences(plan, delta.addedInterferences, touch)
+        rebuild.update(changed)
+        pool.extend(released)
+
+    if delta.addedUsers is not None and len(delta.addedUsers.ids):
+        pool.extend(addUsers(plan, delta.addedUsers))
+
+    # The users may have changed, so they are looked up in the updated table
+    getUser = plan.users.__getitem__
+
+    # Rebuild the changed sattelites over all of their viable users, in sattelite order
+    for satteliteID, sattelite in plan.sattelites.items():
+        if satteliteID in rebuild:
+            touch(sattelite)
+            sattelite.beamFactory(plan.existing, getUser)
+
+    # Offer the users still unserved to the sattelites with room that can see them
+    pool = np.unique(np.array([id for id in pool if id not in plan.existing and id in plan.users], dtype=np.int64))
+
+    if len(pool):
+        rows = np.sort(plan.users.rows(pool))
+        poolIDs = plan.users.ids[rows]
+        visible = visibleUsersBySattelite(plan.users.positions[rows], plan.sattelitePositions())
+
+        for candidates, (satteliteID, sattelite) in zip(visible, plan.sattelites.items()):
+            if len(candidates) == 0 or satteliteID in rebuild or len(sattelite.getBeams()) == beamsPerSattelite:
+                continue
+
+            # Only the users viable to the sattelite (i.e. also free of external interference)
+            candidates = poolIDs[candidates]
+            candidates = candidates[np.isin(candidates, viableArray(sattelite))]
+
+            if len(candidates):
+                touch(sattelite)
+                sattelite.beamFactory(plan.existing, getUser, candidates.tolist())
+
+    # Compare the beams of every sattelite that changed, by beam ID, user and color
+    # (the beams kept by removeBeams keep their IDs, so only the beams that changed differ)
+    added, removed = [], []
+    for satteliteID, sattelite in plan.sattelites.items():
+        if satteliteID not in before:
+            continue
+
+        old = {(beam.beamID, beam.getUserID(), beam.getColor()): beam for beam in before[satteliteID]}
+        new = {(beam.beamID, beam.getUserID(), beam.getColor()): beam for beam in sattelite.getBeams()}
+        removed.extend(beam for key, beam in old.items() if key not in new)
+        added.extend(beam for key, beam in new.items() if key not in old)
+
+    return plan, BeamDiff(added, removed)
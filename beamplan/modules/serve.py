@@ -0,0 +1,214 @@
+"""
+Module containing the planner service functionality for the beamplan package.
+
+Rather than starting a process (and parsing and measuring the scenario) for
+every planning request, the service keeps the solved plans resident, and
+answers JSON requests to load, update and query them over localhost HTTP or
+a Unix socket.  It needs nothing but the standard library.
+
+    GET    /scenarios                        names of the plans held
+    POST   /scenarios/NAME                   plans a scenario {"path": ...} or {"scenario": text}
+    GET    /scenarios/NAME                   counts of the entities and beams of a plan
+    DELETE /scenarios/NAME                   drops a plan
+    GET    /scenarios/NAME/beams             beams of a plan, as [sat, beam, user, color]
+    POST   /scenarios/NAME/update            applies a delta (see replan.Delta), returns the beam diff
+    GET    /scenarios/NAME/users/ID          state of one user of a plan
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+from os import remove, stat
+from os.path import abspath, exists
+from stat import S_ISSOCK
+
+from beamplan.classes.PlanStore import PlanStore
+from beamplan.classes.PlanServer import PlanHTTPServer, PlanUnixServer, unixSockets
+from beamplan.modules.parse import Columns, parseLines, parseColumns
+from beamplan.modules.cache import loadColumns
+from beamplan.modules.replan import Delta
+from beamplan.modules.solver import solvers
+
+def columnsFromJSON(entities):
+    """
+    Returns the Columns of a JSON list of entities, each given as [id, x, y, z].
+
+    Arguments:
+        entities {list} -- the entities (None for none)
+
+    Raises:
+        ValueError -- an entity is not of the form [id, x, y, z]
+    """
+    if entities is None:
+        return None
+
+    if not isinstance(entities, list):
+        raise ValueError("Entities must be given as lists of [id, x, y, z].")
+
+    try:
+        rows = np.array(entities, dtype=np.float64).reshape(-1, 4)
+    except (TypeError, ValueError):
+        raise ValueError("Entities must be given as lists of [id, x, y, z].")
+
+    if len(rows) != len(entities) or not np.all(rows[:, 0] == np.round(rows[:, 0])):
+        raise ValueError("Entities must be given as lists of [id, x, y, z], with integer IDs.")
+
+    return Columns(rows[:, 0].astype(np.int64), np.ascontiguousarray(rows[:, 1:]))
+
+def deltaFromJSON(body):
+    """
+    Returns the Delta of the JSON body of an update request.
+
+    Arguments:
+        body {dict} -- the body, with any of "addedUsers", "movedSattelites" and
+            "addedInterferences" (lists of [id, x, y, z]) and "removedUsers" (list of IDs)
+
+    Raises:
+        ValueError -- the body is not a delta
+    """
+    unknown = set(body) - set(Delta._fields)
+    if unknown:
+        raise ValueError("Unknown fields of a delta: {}.".format(", ".join(sorted(unknown))))
+
+    removed = body.get("removedUsers")
+    if removed is not None and (not isinstance(removed, list) or not all(isinstance(id, int) for id in removed)):
+        raise ValueError("Removed users must be given as a list of integer IDs.")
+
+    return Delta(columnsFromJSON(body.get("addedUsers")), removed,
+                 columnsFromJSON(body.get("movedSattelites")), columnsFromJSON(body.get("addedInterferences")))
+
+def beamsToJSON(beams):
+    """
+    Returns the beams as a JSON list of [sat, beam, user, color].
+
+    Arguments:
+        beams {iterable} -- the Beams to convert
+    """
+    return [[beam.getSatteliteID(), beam.getBeamID(), beam.getUserID(), beam.getColor()] for beam in beams]
+
+def loadScenario(store, name, body):
+    """
+    Plans the scenario of a load request, and holds it in the store.
+
+    Arguments:
+        store {PlanStore} -- the plans held by the service
+        name {str} -- the name to hold the plan under
+        body {dict} -- the body, with either "path" (of a scenario file, cached as by the
+            command line tool unless "cache" is false) or "scenario" (its text), and
+            optionally "solver" and "workers"
+
+    Raises:
+        ValueError -- the body is not a scenario, or the scenario could not be parsed
+    """
+    solver, workers = body.get("solver", "greedy"), body.get("workers", 1)
+
+    if not isinstance(solver, str) or solver not in solvers:
+        raise ValueError("Unknown solver: {}.".format(solver))
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError("Workers must be a positive integer.")
+
+    if "scenario" in body:
+        columns = parseLines(str(body["scenario"]).splitlines())
+    elif "path" in body:
+        try:
+            path = abspath(str(body["path"]))
+            columns = loadColumns(path) if body.get("cache", True) else parseColumns(path)
+        except OSError as e:
+            raise ValueError("Scenario could not be read: {}".format(e))
+    else:
+        raise ValueError("A scenario must be given by its \"path\" or its \"scenario\" text.")
+
+    return store.load(name, columns, solver, workers)
+
+def respond(store, method, parts, body):
+    """
+    Answers one request to the service.
+
+    Arguments:
+        store {PlanStore} -- the plans held by the service
+        method {str} -- the HTTP method of the request
+        parts {list} -- the parts of the path of the request
+        body {dict} -- the JSON body of the request
+
+    Raises:
+        KeyError -- the plan, user or route is not found
+        ValueError -- the request is malformed
+
+    Returns:
+        {tuple} -- (status, payload), the HTTP status and the JSON body of the response
+    """
+    if parts[:1] != ["scenarios"] or len(parts) > 4:
+        raise KeyError("/".join(parts))
+
+    route = (method, len(parts), parts[2] if len(parts) > 2 else None)
+
+    if route == ("GET", 1, None):
+        return 200, {"scenarios": store.names()}
+
+    name = parts[1] if len(parts) > 1 else None
+
+    if route == ("POST", 2, None):
+        return 201, loadScenario(store, name, body)
+    elif route == ("GET", 2, None):
+        return 200, store.summary(name)
+    elif route == ("DELETE", 2, None):
+        store.remove(name)
+        return 200, {"removed": name}
+    elif route == ("GET", 3, "beams"):
+        return 200, {"beams": beamsToJSON(store.beams(name))}
+    elif route == ("POST", 3, "update"):
+        diff, seconds = store.update(name, deltaFromJSON(body))
+        return 200, {"added": beamsToJSON(diff.added), "removed": beamsToJSON(diff.removed), "seconds": seconds}
+    elif route == ("GET", 4, "users"):
+        try:
+            userID = int(parts[3])
+        except ValueError:
+            raise KeyError(parts[3])
+        return 200, store.user(name, userID)
+
+    raise KeyError("/".join(parts))
+
+def serve(host="127.0.0.1", port=8421, socketPath=None, threads=4):
+    """
+    Runs the planner service until it is interrupted.
+
+    Arguments:
+        host {str} -- the host to listen on (localhost by default)
+        port {int} -- the port to listen on
+        socketPath {str} -- the path of a Unix socket to listen on instead (None for TCP)
+        threads {int} -- the most requests handled at once
+
+    Raises:
+        ValueError -- a socket path was given, but the platform has no Unix sockets
+    """
+    if socketPath is not None and not unixSockets:
+        raise ValueError("Unix sockets are not supported on this platform, listen on a port instead.")
+
+    store = PlanStore()
+
+    def answer(method, parts, body):
+        return respond(store, method, parts, body)
+
+    if socketPath is not None:
+        # A socket left behind by a previous run is replaced (anything else is left alone)
+        if exists(socketPath) and S_ISSOCK(stat(socketPath).st_mode):
+            remove(socketPath)
+        server = PlanUnixServer(socketPath, answer, threads)
+        print("Serving on unix:{}".format(socketPath), flush=True)
+    else:
+        server = PlanHTTPServer((host, port), answer, threads)
+        print("Serving on http://{}:{}".format(*server.server_address[:2]), flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socketPath is not None and exists(socketPath):
+            remove(socketPath)
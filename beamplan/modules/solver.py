@@ -0,0 +1,609 @@
+"""
+Module containing the beam assignment solvers for the beamplan package.
+
+A solver takes the users and the sattelites (with their viable users already
+determined), and makes the beams between them.  Each solver fills the mapping
+of users to the sattelites serving them as it goes.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+from heapq import heappush, heappop
+from math import atan2
+from concurrent.futures import ProcessPoolExecutor
+
+from beamplan import beamsPerSattelite
+
+"""The most rounds of matching and coloring the flow solver makes before filling greedily"""
+flowColorRounds = 8
+
+"""The most augmenting phases the flow solver runs per round (bounds the runtime)"""
+flowMaxPhases = 64
+
+def greedySolver(users, sattelites, existing):
+    """
+    Assigns beams one sattelite at a time, in the order of the sattelites.
+
+    Each sattelite greedily takes its first viable users that are not yet served.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        existing {dict} -- mapping of user ID to the ID of the sattelite serving it
+
+    Returns:
+        {dict} -- updated mapping of the users served
+    """
+    for _ in greedySattelites(users, sattelites, existing):
+        pass
+
+    return existing
+
+def greedySattelites(users, sattelites, existing):
+    """
+    Assigns beams as greedySolver does, yielding each sattelite as soon as its turn ends.
+
+    A sattelite is never revisited after its turn, so its beams are final when it is yielded.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        existing {dict} -- mapping of user ID to the ID of the sattelite serving it
+
+    Yields:
+        {Sattelite} -- each sattelite, in order, with its final beams
+    """
+
+    # For each sattelite
+    for _, sattelite in sattelites.items():
+        # Connect to as many beams as possible given the constraints
+        sattelite.beamFactory(existing, users.__getitem__)
+        yield sattelite
+
+def coloringSolver(users, sattelites, existing):
+    """
+    Assigns beams one sattelite at a time, coloring the candidates of each as a conflict graph.
+
+    Each sattelite takes its unserved viable users as greedySolver does, but rather than
+    trying each user's colors against its beams one pair at a time, builds the conflict graph
+    of the users at once and colors it (see Sattelite.colorFactory), so a user is not turned
+    away for want of a color another coloring would have left it.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        existing {dict} -- mapping of user ID to the ID of the sattelite serving it
+
+    Returns:
+        {dict} -- updated mapping of the users served
+    """
+    for _ in coloringSattelites(users, sattelites, existing):
+        pass
+
+    return existing
+
+def coloringSattelites(users, sattelites, existing):
+    """
+    Assigns beams as coloringSolver does, yielding each sattelite as soon as its turn ends.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        existing {dict} -- mapping of user ID to the ID of the sattelite serving it
+
+    Yields:
+        {Sattelite} -- each sattelite, in order, with its final beams
+    """
+
+    # For each sattelite
+    for _, sattelite in sattelites.items():
+        # Connect to as many beams as possible, coloring the candidates together
+        sattelite.colorFactory(existing, users)
+        yield sattelite
+
+def buildGraph(users, sattelites):
+    """
+    Builds the bipartite graph between the users and the sattelites they can be served by.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+
+    Returns:
+        {tuple} -- (userIDs, adjacency), where adjacency[u] lists the indices (in sattelite
+            order) of the sattelites user userIDs[u] is viable to
+    """
+    userIDs = list(users.keys())
+    userRows = {userID: row for row, userID in enumerate(userIDs)}
+    adjacency = [[] for _ in userIDs]
+
+    for column, sattelite in enumerate(sattelites.values()):
+        for userID in sattelite.getViableUsers():
+            adjacency[userRows[userID]].append(column)
+
+    return userIDs, adjacency
+
+def augmentMatching(adjacency, matched, assigned, spare, maxPhases):
+    """
+    Grows a capacity-constrained matching of users to sattelites along augmenting paths.
+
+    Each phase finds, with one breadth-first search from every unmatched user, the length
+    of the shortest augmenting paths, then augments along as many paths of that length as
+    it can (Hopcroft-Karp, with the capacity of a sattelite in place of a single partner).
+    A path may move matched users to other sattelites to free a slot for an unmatched one.
+
+    Arguments:
+        adjacency {list} -- for each user, the indices of the sattelites it can be matched to
+        matched {list} -- for each user, the index of its sattelite (or None), updated in place
+        assigned {list} -- for each sattelite, a dict (ordered set) of its users, updated in place
+        spare {list} -- for each sattelite, its remaining capacity, updated in place
+        maxPhases {int} -- the most phases to run
+
+    Returns:
+        {int} -- the number of users added to the matching
+    """
+    numUsers, numSattelites = len(adjacency), len(spare)
+    unreached = numUsers + numSattelites + 1
+    added = 0
+
+    for _ in range(maxPhases):
+        userDistance = [unreached] * numUsers
+        satteliteDistance = [unreached] * numSattelites
+
+        # Start the search from every unmatched user that has a sattelite at all
+        frontier = [u for u in range(numUsers) if matched[u] is None and adjacency[u]]
+        for u in frontier:
+            userDistance[u] = 0
+
+        # Breadth-first search, stopping at the first layer with a sattelite that has room
+        found = False
+        while frontier and not found:
+            nextFrontier = []
+
+            for u in frontier:
+                for j in adjacency[u]:
+                    if j == matched[u] or satteliteDistance[j] != unreached:
+                        continue
+
+                    satteliteDistance[j] = userDistance[u] + 1
+
+                    if spare[j] > 0:
+                        found = True
+                    else:
+                        for v in assigned[j]:
+                            if userDistance[v] == unreached:
+                                userDistance[v] = satteliteDistance[j] + 1
+                                nextFrontier.append(v)
+
+            frontier = nextFrontier
+
+        # No augmenting path left, the matching is maximum
+        if not found:
+            break
+
+        visited = [False] * numUsers
+
+        def options(u):
+            """
+            Generates the (sattelite, displaced user) steps out of user u along the layers.
+            """
+            for j in adjacency[u]:
+                if j == matched[u] or satteliteDistance[j] != userDistance[u] + 1:
+                    continue
+
+                if spare[j] > 0:
+                    yield j, None
+                else:
+                    for v in list(assigned[j]):
+                        if not visited[v] and userDistance[v] == satteliteDistance[j] + 1:
+                            yield j, v
+
+        phaseAdded = 0
+
+        # Depth-first search from each unmatched user along the layers
+        for root in range(numUsers):
+            if matched[root] is not None or userDistance[root] != 0:
+                continue
+
+            visited[root] = True
+            stack = [(root, None, options(root))]
+
+            while stack:
+                u, via, steps = stack[-1]
+                step = next(steps, None)
+
+                # Dead end, back up
+                if step is None:
+                    stack.pop()
+                    continue
+
+                j, v = step
+
+                # Follow a full sattelite to the user it would displace
+                if v is not None:
+                    visited[v] = True
+                    stack.append((v, j, options(v)))
+                    continue
+
+                # Reached a sattelite with room, shift every user along the path by one
+                target = j
+                for w, wVia, _ in reversed(stack):
+                    if matched[w] is not None:
+                        del assigned[matched[w]][w]
+                    matched[w] = target
+                    assigned[target][w] = True
+                    target = wVia
+
+                spare[j] -= 1
+                phaseAdded += 1
+                break
+
+        added += phaseAdded
+
+        if phaseAdded == 0:
+            break
+
+    return added
+
+def flowSolver(users, sattelites, existing):
+    """
+    Assigns beams from a maximum matching of users to sattelites across the constellation.
+
+    The users and sattelites form a bipartite graph, where each sattelite can take up to
+    beamsPerSattelite users.  A maximum matching of the graph places as many users as the
+    capacities allow, regardless of the order of the sattelites.  Each sattelite then
+    colors its matched users with beamFactory.  Users that do not fit a color are barred
+    from that sattelite, the sattelite keeps only the capacity it could color, and the
+    matching is grown again.  A final greedy pass fills any remaining room.
+
+    A user served before the solver ran (e.g. by seedBeams) is pinned to its sattelite,
+    keeping the color of its beam, and a user served by a sattelite not given is left alone.
+    The mapping of the users served is rebuilt from the beams made.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        existing {dict} -- mapping of user ID to the ID of the sattelite serving it
+
+    Returns:
+        {dict} -- updated mapping of the users served
+    """
+    satteliteList = list(sattelites.values())
+    userIDs, adjacency = buildGraph(users, sattelites)
+    userRows = {userID: row for row, userID in enumerate(userIDs)}
+    columns = {sattelite.getID(): j for j, sattelite in enumerate(satteliteList)}
+
+    # The users served by sattelites not given stay served (and out of the matching)
+    elsewhere = {userID: satteliteID for userID, satteliteID in existing.items() if satteliteID not in columns}
+    for userID in elsewhere:
+        if userID in userRows:
+            adjacency[userRows[userID]] = []
+
+    # The beams of the users served before the solver ran, in order, pinned to their sattelite
+    pinned = [[(userRows[beam.getUserID()], beam.getColor()) for beam in sattelite.getBeams()
+               if existing.get(beam.getUserID()) == sattelite.getID() and beam.getUserID() in userRows]
+              for sattelite in satteliteList]
+
+    matched = [None] * len(userIDs)
+    assigned = [{} for _ in satteliteList]
+    spare = [beamsPerSattelite] * len(satteliteList)
+
+    for j, beams in enumerate(pinned):
+        for u, _ in beams:
+            adjacency[u] = [j]
+            matched[u] = j
+            assigned[j][u] = True
+            spare[j] -= 1
+
+    # Start from a greedy matching, placing the users with the fewest options first
+    for u in sorted(range(len(userIDs)), key=lambda u: len(adjacency[u])):
+        if matched[u] is not None:
+            continue
+
+        options = [j for j in adjacency[u] if spare[j] > 0]
+        if options:
+            j = max(options, key=lambda j: spare[j])
+            matched[u] = j
+            assigned[j][u] = True
+            spare[j] -= 1
+
+    served = dict(elsewhere)
+
+    for _ in range(flowColorRounds):
+        # Grow the matching to a maximum (within the phase bound)
+        augmentMatching(adjacency, matched, assigned, spare, flowMaxPhases)
+
+        # Color each sattelite's matched users (the pinned ones first, with their colors, then in user order)
+        served = dict(elsewhere)
+        rejected = False
+
+        for j, sattelite in enumerate(satteliteList):
+            sattelite.clearBeams()
+            sattelite.clearRejectedUsers()
+
+            for u, color in pinned[j]:
+                sattelite.addBeam(userIDs[u], color, sattelite.userDirection(users[userIDs[u]]))
+                served[userIDs[u]] = sattelite.getID()
+
+            sattelite.beamFactory(served, users.__getitem__, [userIDs[u] for u in sorted(assigned[j])])
+
+            # Bar the users that could not be colored, and keep only the colored capacity
+            uncolored = [u for u in assigned[j] if userIDs[u] not in served]
+            for u in uncolored:
+                adjacency[u] = [k for k in adjacency[u] if k != j]
+                del assigned[j][u]
+                matched[u] = None
+
+            if uncolored:
+                spare[j] = 0
+                rejected = True
+
+        if not rejected:
+            break
+
+    # Fill any remaining room greedily, without moving the colored beams
+    for sattelite in satteliteList:
+        sattelite.beamFactory(served, users.__getitem__)
+
+    existing.clear()
+    existing.update(served)
+    return existing
+
+def scarcitySolver(users, sattelites, existing):
+    """
+    Assigns beams one sattelite at a time, scheduling both the sattelites and the users by scarcity.
+
+    The sattelites are kept in a heap keyed by contention (the sum, over the unserved users
+    viable to a sattelite, of one over the number of sattelites still open to that user).
+    The most contended sattelite is filled first, trying its users with the fewest open
+    sattelites first.  When a sattelite is done, its served users stop contending for the
+    others, and its unserved users lose an option, so the contention of the sattelites
+    they share is updated incrementally.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        existing {dict} -- mapping of user ID to the ID of the sattelite serving it
+
+    Returns:
+        {dict} -- updated mapping of the users served
+    """
+    satteliteList = list(sattelites.values())
+    userIDs, adjacency = buildGraph(users, sattelites)
+    userRows = {userID: row for row, userID in enumerate(userIDs)}
+
+    # The number of sattelites still open to each user (users already served have none)
+    options = [0 if userIDs[u] in existing else len(adjacency[u]) for u in range(len(userIDs))]
+
+    # The contention of each sattelite, and a version to tell stale heap entries apart
+    contention = [0.0] * len(satteliteList)
+    for u, columns in enumerate(adjacency):
+        if options[u]:
+            for j in columns:
+                contention[j] += 1.0 / options[u]
+
+    version = [0] * len(satteliteList)
+    done = [False] * len(satteliteList)
+    heap = [(-contention[j], j, 0) for j in range(len(satteliteList))]
+    heap.sort()
+
+    while heap:
+        _, j, entryVersion = heappop(heap)
+
+        # Skip entries made stale by a later update
+        if done[j] or entryVersion != version[j]:
+            continue
+
+        done[j] = True
+        sattelite = satteliteList[j]
+
+        # Try the unserved viable users of the sattelite, fewest open sattelites first
+        candidates = [userRows[userID] for userID in sattelite.getViableUsers() if userID not in existing]
+        candidates.sort(key=lambda u: options[u])
+        sattelite.beamFactory(existing, users.__getitem__, [userIDs[u] for u in candidates])
+
+        # Update the contention of the other sattelites these users are viable to
+        touched = set()
+        for u in candidates:
+            if userIDs[u] in existing:
+                # A served user no longer contends for any sattelite
+                share, options[u] = 1.0 / options[u], 0
+                for k in adjacency[u]:
+                    if not done[k]:
+                        contention[k] -= share
+                        touched.add(k)
+            else:
+                # An unserved user has one fewer sattelite open to it
+                share = 1.0 / options[u]
+                options[u] -= 1
+                if options[u]:
+                    for k in adjacency[u]:
+                        if not done[k]:
+                            contention[k] += (1.0 / options[u]) - share
+                            touched.add(k)
+
+        for k in touched:
+            version[k] += 1
+            heappush(heap, (-contention[k], k, version[k]))
+
+    return existing
+
+"""The available solvers, by name"""
+solvers = {
+    "greedy": greedySolver,
+    "flow": flowSolver,
+    "scarcity": scarcitySolver,
+    "coloring": coloringSolver
+}
+
+"""
+The solvers that settle the sattelites one at a time, by name, as generators yielding each
+sattelite once its beams are final (the other solvers revisit sattelites until they finish)
+"""
+streamingSolvers = {
+    "greedy": greedySattelites,
+    "coloring": coloringSattelites
+}
+
+def satteliteGroups(users, sattelites, numGroups):
+    """
+    Splits the sattelites into groups that share as few viable users as possible.
+
+    Sattelites connected by a shared viable user form a component.  Components are placed
+    whole, largest first, into the group with the fewest viable users so far.  A component
+    holding more than a group's share of the viable users is first cut into slices by
+    longitude, so only the users on the edge of a slice are shared between groups.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        numGroups {int} -- the number of groups to split into
+
+    Returns:
+        {list} -- the groups, each a list of indices (in sattelite order) of its sattelites
+    """
+    satteliteList = list(sattelites.values())
+    _, adjacency = buildGraph(users, sattelites)
+
+    # Join the sattelites sharing a user into components (union-find)
+    parent = list(range(len(satteliteList)))
+
+    def find(j):
+        """
+        Returns the root of the component of sattelite j, compressing the path.
+        """
+        while parent[j] != j:
+            parent[j] = parent[parent[j]]
+            j = parent[j]
+        return j
+
+    for columns in adjacency:
+        for k in columns[1:]:
+            parent[find(k)] = find(columns[0])
+
+    components = {}
+    for j in range(len(satteliteList)):
+        components.setdefault(find(j), []).append(j)
+
+    load = [len(sattelite.getViableUsers()) for sattelite in satteliteList]
+    share = max(1, sum(load) // numGroups)
+
+    # Cut the components larger than a share into slices of sattelites by longitude
+    pieces = []
+    for component in components.values():
+        if sum(load[j] for j in component) <= share:
+            pieces.append(component)
+            continue
+
+        component.sort(key=lambda j: atan2(satteliteList[j].getY(), satteliteList[j].getX()))
+        piece, pieceLoad = [], 0
+        for j in component:
+            piece.append(j)
+            pieceLoad += load[j]
+            if pieceLoad >= share:
+                pieces.append(piece)
+                piece, pieceLoad = [], 0
+        if piece:
+            pieces.append(piece)
+
+    # Place the pieces, largest first, into the least loaded group
+    groups = [[] for _ in range(numGroups)]
+    groupLoad = [0] * numGroups
+    for piece in sorted(pieces, key=lambda piece: -sum(load[j] for j in piece)):
+        g = groupLoad.index(min(groupLoad))
+        groups[g].extend(piece)
+        groupLoad[g] += sum(load[j] for j in piece)
+
+    return [sorted(group) for group in groups if group]
+
+def solveGroup(solverName, groupUsers, groupSattelites, served):
+    """
+    Assigns the beams of a group of sattelites on its own (in a worker process).
+
+    Arguments:
+        solverName {str} -- name of the solver to assign the beams with
+        groupUsers {dict} -- mapping of user ID to User object, for the users viable to the group
+        groupSattelites {dict} -- mapping of sattelite ID to Sattelite object, for the group
+        served {dict} -- mapping of the users of the group served before the solver ran, to their sattelite
+
+    Returns:
+        {list} -- for each sattelite of the group, its ID, its beams as (userID, color) tuples,
+            and the users it rejected (see Sattelite.getRejectedUsers)
+    """
+    solvers[solverName](groupUsers, groupSattelites, served)
+
+    return [(satteliteID, ([(beam.getUserID(), beam.getColor()) for beam in sattelite.getBeams()],
+                           sattelite.getRejectedUsers()))
+            for satteliteID, sattelite in groupSattelites.items()]
+
+def parallelSolver(users, sattelites, existing, workers, solverName="greedy"):
+    """
+    Assigns beams with groups of sattelites solved in parallel across a pool of processes.
+
+    The sattelites are split with satteliteGroups, and each group is solved on its own by a
+    worker with the named solver.  A user on the edge of two groups may be served by both,
+    so the beams are reconciled in sattelite order: the first sattelite keeps the user and
+    the others drop the beam (dropping a beam never breaks a coloring).  A user served before
+    the solver ran (e.g. by seedBeams) stays on its sattelite, if that sattelite kept its beam.
+    A final greedy pass fills the room the dropped beams left.
+
+    Arguments:
+        users {dict} -- mapping of user ID to User object
+        sattelites {dict} -- mapping of sattelite ID to Sattelite object
+        existing {dict} -- mapping of user ID to the ID of the sattelite serving it
+        workers {int} -- the number of worker processes
+        solverName {str} -- name of the solver each group is solved with
+
+    Returns:
+        {dict} -- updated mapping of the users served
+    """
+    satteliteList = list(sattelites.values())
+    groups = satteliteGroups(users, sattelites, workers)
+
+    # Hand each group its sattelites, the users viable to them, and those of the users already served
+    payloads = []
+    for group in groups:
+        groupSattelites = {satteliteList[j].getID(): satteliteList[j] for j in group}
+        groupUsers, served = {}, {}
+        for sattelite in groupSattelites.values():
+            for userID in sattelite.getViableUsers():
+                groupUsers[userID] = users[userID]
+                if userID in existing:
+                    served[userID] = existing[userID]
+        payloads.append((groupUsers, groupSattelites, served))
+
+    beams = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = [pool.submit(solveGroup, solverName, groupUsers, groupSattelites, served)
+                   for groupUsers, groupSattelites, served in payloads]
+        for result in results:
+            beams.update(result.result())
+
+    # Keep the users served before the solver ran whose sattelite still has their beam
+    seeded = dict(existing)
+    existing.clear()
+    for satteliteID, (satteliteBeams, _) in beams.items():
+        for userID, _ in satteliteBeams:
+            if seeded.get(userID) == satteliteID:
+                existing[userID] = satteliteID
+
+    # Reconcile the beams in sattelite order, keeping each other user on the first sattelite serving it
+    for satteliteID, sattelite in sattelites.items():
+        sattelite.clearBeams()
+        satteliteBeams, rejected = beams.get(satteliteID, ([], ()))
+        sattelite.getRejectedUsers().extend(rejected)
+        for userID, color in satteliteBeams:
+            if existing.get(userID, satteliteID) == satteliteID:
+                sattelite.addBeam(userID, color, sattelite.userDirection(users[userID]))
+                existing[userID] = satteliteID
+
+    # Fill the room left by dropped beams greedily
+    for sattelite in satteliteList:
+        sattelite.beamFactory(existing, users.__getitem__)
+
+    return existing
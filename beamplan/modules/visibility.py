@@ -0,0 +1,140 @@
+"""
+Module containing the vectorized visibility functionality for the beamplan package.
+
+Rather than measuring the angle between every user and sattelite one pair at a
+time, the positions are stacked into arrays and the cosine of the angle is
+compared against the cosine of the visibility threshold in chunked batches.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import numpy as np
+
+from beamplan.classes.Entity import Entity
+from beamplan.classes.SatteliteIndex import SatteliteIndex
+from beamplan.modules.measurement import isVisible, cosUserVisible, cosineGuardBand
+
+"""The (approximate) number of pairs measured per vectorized batch"""
+batchSize = 1 << 22
+
+def stackPositions(entities):
+    """
+    Stacks the ECEF positions of the provided entities into an array.
+
+    Arguments:
+        entities (iterable) -- the Entity objects to stack (in order)
+
+    Returns:
+        (numpy.ndarray) -- (N, 3) array of the x, y and z coordinates of each entity
+    """
+    return np.array([[e.getX(), e.getY(), e.getZ()] for e in entities], dtype=np.float64).reshape(-1, 3)
+
+def visibilityMatrix(userPositions, sattelitePositions):
+    """
+    Determines the visibility of every sattelite to every user, given the constraints
+
+    The cosine of the origin-user-sattelite angle is computed for all pairs of a batch of
+    users at once, and compared against the cosine of the visibility threshold.  Pairs that
+    fall within the guard band of the threshold are decided by isVisible, given their cosine,
+    so the result is always identical to calling satteliteIsVisible on every pair.
+
+    Arguments:
+        userPositions (numpy.ndarray) -- (U, 3) array of user positions
+        sattelitePositions (numpy.ndarray) -- (S, 3) array of sattelite positions
+
+    Returns:
+        (numpy.ndarray) -- (U, S) boolean array, True where the sattelite is visible to the user
+    """
+    numUsers, numSattelites = len(userPositions), len(sattelitePositions)
+    visible = np.zeros((numUsers, numSattelites), dtype=bool)
+
+    if numUsers == 0 or numSattelites == 0:
+        return visible
+
+    # Squared magnitudes of the sattelite positions (shared by every batch)
+    satteliteSquared = np.einsum("ij,ij->i", sattelitePositions, sattelitePositions)
+
+    # Size the batches of users so each one measures roughly batchSize pairs
+    rowsPerBatch = max(1, batchSize // numSattelites)
+
+    for start in range(0, numUsers, rowsPerBatch):
+        users = userPositions[start:start + rowsPerBatch]
+
+        # Dot products between each user and sattelite, and magnitudes of the users
+        userDotSattelite = users @ sattelitePositions.T
+        userSquared = np.einsum("ij,ij->i", users, users)[:, None]
+
+        # (origin - user) . (sattelite - user), and |sattelite - user|
+        numerator = userSquared - userDotSattelite
+        distance = np.sqrt(np.maximum(satteliteSquared[None, :] - 2.0 * userDotSattelite + userSquared, 0.0))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cosine = numerator / (np.sqrt(userSquared) * distance)
+
+        # Visible when the angle is greater than the threshold (i.e. the cosine is smaller)
+        visible[start:start + rowsPerBatch] = cosine < cosUserVisible
+
+        # Re-measure the pairs too close to the threshold to decide in batch
+        for row, column in zip(*np.nonzero(~(np.abs(cosine - cosUserVisible) > cosineGuardBand))):
+            user = Entity(None, *users[row])
+            sattelite = Entity(None, *sattelitePositions[column])
+            visible[start + row, column] = isVisible(user, sattelite, float(cosine[row, column]))
+
+    return visible
+
+def visibleUsersBySattelite(userPositions, sattelitePositions):
+    """
+    Determines the users each sattelite is visible to, given the constraints
+
+    Rather than testing every pair, a SatteliteIndex narrows each user down to the
+    sattelites near its own visible cone, and only those candidates are tested with
+    visibilityMatrix.  When every pair fits in a single batch (e.g. a few moved
+    sattelites), the pairs are tested directly, without building the index.
+
+    Arguments:
+        userPositions (numpy.ndarray) -- (U, 3) array of user positions
+        sattelitePositions (numpy.ndarray) -- (S, 3) array of sattelite positions
+
+    Returns:
+        (list) -- for each sattelite, an ascending array of the rows of the users it is visible to
+    """
+    numSattelites = len(sattelitePositions)
+
+    if len(userPositions) == 0 or numSattelites == 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(numSattelites)]
+
+    # Few enough pairs to test them all at once
+    if len(userPositions) * numSattelites <= batchSize:
+        visible = visibilityMatrix(userPositions, sattelitePositions)
+        return [np.flatnonzero(visible[:, column]) for column in range(numSattelites)]
+
+    # Index the sattelites by direction, sized to the cone of the closest user
+    userRadius = float(np.sqrt(np.einsum("ij,ij->i", userPositions, userPositions)).min())
+    index = SatteliteIndex(sattelitePositions, userRadius)
+
+    rows, columns = [], []
+
+    # For each group of users sharing the same candidate sattelites
+    for userRows, satteliteColumns in index.candidates(userPositions):
+        # Run the exact visibility test over the candidates only
+        visible = visibilityMatrix(userPositions[userRows], sattelitePositions[satteliteColumns])
+        pairRows, pairColumns = np.nonzero(visible)
+        rows.append(userRows[pairRows])
+        columns.append(satteliteColumns[pairColumns])
+
+    if not rows:
+        return [np.empty(0, dtype=np.int64) for _ in range(numSattelites)]
+
+    rows, columns = np.concatenate(rows), np.concatenate(columns)
+
+    # Sort the visible pairs by sattelite, then by user, and split them per sattelite
+    order = np.lexsort((rows, columns))
+    bounds = np.searchsorted(columns[order], np.arange(numSattelites + 1))
+    rows = rows[order]
+
+    return [rows[bounds[i]:bounds[i + 1]] for i in range(numSattelites)]
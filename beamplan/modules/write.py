@@ -0,0 +1,149 @@
+"""
+Module containing the plan writing functionality for the beamplan package.
+
+Rather than printing the beams one at a time, the beams of a plan are gathered
+into columns once, formatted in bulk, and written in a few large chunks.  Besides
+the text format of the solution files ("sat X beam Y user Z color C"), a plan can
+be written as CSV or JSON lines, or as the arrays of a binary .npz file, for
+tooling downstream of the planner.  The text formats can also be streamed, each
+sattelite's beams written (and flushed) as soon as they are final.
+
+The following are functions that are to be used exclusively for the beamplan
+package, and thus cannot be invoked via interpreter, but rather imported.
+"""
+
+__author__ = "Robert Dekovich"
+__email__ = "dekovich@umich.edu"
+__status__ = "Development"
+
+import sys
+import numpy as np
+from contextlib import contextmanager
+
+"""The number of beams formatted into each write"""
+chunkSize = 1 << 16
+
+"""The template of a beam in each text format (the text format is that of Beam.__str__)"""
+templates = {
+    "text": "sat {} beam {} user {} color {}\n",
+    "csv": "{},{},{},{}\n",
+    "jsonl": "{{\"sat\": {}, \"beam\": {}, \"user\": {}, \"color\": \"{}\"}}\n"
+}
+
+"""The header written before the beams of each text format"""
+headers = {"text": "", "csv": "sat,beam,user,color\n", "jsonl": ""}
+
+"""The formats a plan can be written in"""
+formats = tuple(templates) + ("npz",)
+
+def planColumns(plan):
+    """
+    Gathers the beams of a plan into columns, in the order of the sattelites.
+
+    Arguments:
+        plan {Plan} -- the plan to gather
+
+    Returns:
+        {dict} -- the "sat", "beam" and "user" IDs (int64 arrays) and the "color" (str array) of each beam
+    """
+    sattelites, beams, users, colors = [], [], [], []
+
+    for beam in plan.getBeams():
+        sattelites.append(beam.satteliteID)
+        beams.append(beam.beamID)
+        users.append(beam.userID)
+        colors.append(beam.color)
+
+    return {
+        "sat": np.array(sattelites, dtype=np.int64),
+        "beam": np.array(beams, dtype=np.int64),
+        "user": np.array(users, dtype=np.int64),
+        "color": np.array(colors, dtype="U1")
+    }
+
+def formatChunks(columns, format="text"):
+    """
+    Formats the columns of beams in chunks of chunkSize beams.
+
+    Arguments:
+        columns {dict} -- the columns of the beams (see planColumns)
+        format {str} -- "text", "csv" or "jsonl"
+
+    Yields:
+        {str} -- the header of the format, then each chunk of formatted beams
+    """
+    template = templates[format].format
+
+    if headers[format]:
+        yield headers[format]
+
+    sattelites, beams, users, colors = (columns[name].tolist() for name in ("sat", "beam", "user", "color"))
+
+    for start in range(0, len(beams), chunkSize):
+        end = start + chunkSize
+        yield "".join(map(template, sattelites[start:end], beams[start:end], users[start:end], colors[start:end]))
+
+@contextmanager
+def openOutput(path, format="text"):
+    """
+    Opens the file the beams are written to, closing it when done.
+
+    Arguments:
+        path {str} -- path of the file to write (None for standard out, which is flushed instead)
+        format {str} -- one of formats (an "npz" file is opened as binary)
+
+    Yields:
+        {file} -- the open file
+    """
+    if path is None:
+        try:
+            yield sys.stdout
+        finally:
+            sys.stdout.flush()
+        return
+
+    with open(path, 'wb' if format == "npz" else 'w') as outfile:
+        yield outfile
+
+def writePlan(plan, outfile, format="text"):
+    """
+    Writes the beams of a plan to a file, in a few large writes.
+
+    Arguments:
+        plan {Plan} -- the plan to write
+        outfile {file} -- the open file to write to (text, or binary for "npz"; a text
+            stream with a binary buffer, such as standard out, is written through the buffer)
+        format {str} -- one of formats
+    """
+    columns = planColumns(plan)
+
+    if format == "npz":
+        np.savez(getattr(outfile, "buffer", outfile), **columns)
+        return
+
+    for chunk in formatChunks(columns, format):
+        outfile.write(chunk)
+
+def streamPlan(settled, outfile, format="text"):
+    """
+    Writes the beams of each sattelite as soon as it settles, flushing after each one.
+
+    Arguments:
+        settled {iterable} -- the Sattelites, as their beams become final (see Plan.settleBeams)
+        outfile {file} -- the open text file to write to
+        format {str} -- "text", "csv" or "jsonl" (an .npz file cannot be streamed)
+
+    Raises:
+        ValueError -- the format cannot be streamed
+    """
+    if format not in templates:
+        raise ValueError("Beams cannot be streamed in the {} format.".format(format))
+
+    template = templates[format].format
+    outfile.write(headers[format])
+
+    for sattelite in settled:
+        beams = sattelite.getBeams()
+        if beams:
+            outfile.write("".join([template(beam.satteliteID, beam.beamID, beam.userID, beam.color) for beam in beams]))
+            outfile.flush()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+Benchmarking module to measure how the package scales with the number of users.
+
+This module will draw a synthetic scenario of each size from a seeded generator,
+plan it, and evaluate the plan, each size in a fresh process.  The wall time of
+every phase, the peak resident memory and the coverage of each size are printed
+as they finish, and recorded to a JSON results file to compare versions against.
+"""
+
+import sys
+import json
+import platform
+import argparse
+import subprocess
+from os.path import abspath, dirname
+from time import perf_counter
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+# Run from a checkout without the package installed
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import numpy as np
+
+from beamplan.classes.Plan import Plan
+from beamplan.modules.solver import solvers
+from beamplan.modules.generate import distributions, generateScenario
+from beamplan.modules.propagate import parseConstellation
+from beamplan.modules.evaluation import evaluatePlan
+from beamplan.modules.profiling import peakRSS
+
+"""The numbers of users benchmarked by default"""
+SIZES = [1000, 10000, 100000, 1000000, 10000000]
+
+"""The results file written by default"""
+RESULTS = abspath("benchmark.json")
+
+def benchmark(users, shells, distribution, interferers, seed, solver):
+    """
+    Draws, plans and evaluates one scenario, timing each phase.
+
+    Runs in a fresh process, so the peak resident memory is that of this size alone.
+
+    Returns:
+        {dict} -- the sizes of the scenario, the seconds of each phase, the peak
+            resident memory (bytes), and the number of beams, coverage and verdict
+    """
+    seconds = {}
+
+    start = perf_counter()
+    columns = generateScenario(users, shells, distribution, interferers, seed)
+    seconds["generate"] = perf_counter() - start
+
+    start = perf_counter()
+    plan = Plan.fromColumns(columns)
+    seconds["build"] = perf_counter() - start
+
+    start = perf_counter()
+    plan.computeViability()
+    seconds["viability"] = perf_counter() - start
+
+    start = perf_counter()
+    plan.assignBeams(solver)
+    seconds["assign"] = perf_counter() - start
+
+    start = perf_counter()
+    evaluation = evaluatePlan(plan)
+    seconds["evaluate"] = perf_counter() - start
+
+    return {
+        "users": len(plan.users),
+        "sattelites": len(plan.sattelites),
+        "interferers": len(plan.interferences),
+        "beams": len(plan.existing),
+        "coverage": evaluation.coverage,
+        "passed": evaluation.passed,
+        "seconds": seconds,
+        "peakRSS": peakRSS()
+    }
+
+def commit():
+    """
+    Returns the commit of the checkout being benchmarked (None outside of a git checkout).
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=dirname(abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    """
+    Main module driver for benchmark.py
+
+    Will handle all I/O, and run each size in a fresh Python process.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks the package against synthetic scenarios of growing size.")
+    parser.add_argument("--sizes", type=lambda s: [int(size) for size in s.split(",")], default=SIZES,
+                        help="Comma-separated numbers of users (default {})".format(",".join(map(str, SIZES))))
+    parser.add_argument("--distribution", choices=distributions, default="uniform", help="Distribution of the users")
+    parser.add_argument("--interferers", type=int, default=36, help="Number of interferers along the geostationary belt")
+    parser.add_argument("--constellation", default=None, help="Constellation file of the sattelites (a Starlink-like shell by default)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator")
+    parser.add_argument("--solver", choices=list(solvers), default="greedy", help="Solver used to assign the beams")
+    parser.add_argument("--output", "-o", default=RESULTS, help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    shells = parseConstellation(abspath(args.constellation)) if args.constellation is not None else None
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "distribution": args.distribution,
+        "interferers": args.interferers,
+        "constellation": args.constellation,
+        "seed": args.seed,
+        "solver": args.solver,
+        "results": []
+    }
+
+    # For each of the sizes, in a fresh process
+    for users in args.sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(benchmark, users, shells, args.distribution, args.interferers,
+                                     args.seed, args.solver).result()
+
+        report["results"].append(result)
+        memory = "n/a" if result["peakRSS"] is None else "{:.1f} MiB".format(result["peakRSS"] / 2 ** 20)
+        print("{} users: {} beams, {:.2f}% covered, {}, peak RSS {}, {}".format(
+            users, result["beams"], result["coverage"] or 0.0, "passed" if result["passed"] else "failed",
+            memory, ", ".join("{} {:.3f}s".format(*phase) for phase in result["seconds"].items())),
+            flush=True)
+
+        # Write the results so far, so an interrupted run still leaves them
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -53,8 +53,9 @@ def main():
         # Run the package on the input
         subprocess.call(["beamplan", infile, "--debug"])
 
-        # Evaluate the output
-        subprocess.call(["python", "evaluate.py", infile, infile + '.out'])
+        # Evaluate the output, collecting the report in the output file
+        with open(join(TEST_ROOT, OUTFILE), "a") as outfile:
+            subprocess.call(["python", "evaluate.py", infile, infile + '.out'], stdout=outfile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
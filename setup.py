@@ -26,7 +26,8 @@ setup(
     include_package_data=True,
     install_requires=[
         "pycodestyle==2.5.0",
-        "click==7.1.2"
+        "click==7.1.2",
+        "numpy>=1.17.0"
     ],
     entry_points={
         "console_scripts": [